@@ -1,18 +1,98 @@
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-import pandas as pd
 import pickle
 import plotly.graph_objs as go
 import base64
 import plotly
 import numpy as np
+import os
+import json
+import dash.exceptions
+import time
+import flask
 from plotly import tools
 
+from well_catalog import WellCatalog, BoundedCache
+from well_geometry import ribbon_topology, trace_bytes, simplify_path, peak_indices
+from downsample import minmax_indices, relayout_x_range, relayout_changes_x
+from fleet_stats import FleetStats, PAIRS, CLAMPED
+import metrics
+from alignment import Alignment, AlignedTrack, Trajectory
+from data_sources import make_source
+
 app = dash.Dash(__name__, static_folder="static")
 
+## width of the 2D plot in pixels, the default number of min/max buckets per panel
+PLOT2D_WIDTH = 1200
+
+VIB_DIRECTIONS = ["ASHK2", "LSHK2"]
+
+## 3D ribbons keep one vibration/WOB peak per this many times the simplification tolerance (ft of MD)
+RIBBON_PEAK_SPACING = 30
+
+
+## the pickle is converted once into per-well channel stores; wells are loaded on demand
+## into a cache bounded by VIB_WELL_CACHE_MB. VIB_WELL_MMAP=1 caches the memory maps
+## instead of private copies, for worker processes sharing one copy (see serve.py)
+wells = WellCatalog(os.environ.get("VIB_WELL_DATA",
+    "/Users/jieyang/PycharmProjects/Shell_internship/Vibration_data/3D_data/trajectory_1f/Phoenix_3D_1f_Vib.pickle"),
+    max_bytes=int(os.environ.get("VIB_WELL_CACHE_MB", 512)) * 2 ** 20,
+    copy=os.environ.get("VIB_WELL_MMAP", "0") != "1")
+
+## built traces per (well, tolerance), so repeat views skip trace3d
+trace_cache = BoundedCache(int(os.environ.get("VIB_TRACE_CACHE_MB", 256)) * 2 ** 20,
+                           sizeof=lambda entry: trace_bytes(entry[0]) + sum(h.nbytes for h in entry[1].values()))
+
+
+## cross-well statistics, computed per well in a process pool on first use and cached on disk
+fleet = FleetStats(wells)
+
+
+@app.server.route("/cache-stats")
+def cache_stats():
+    return json.dumps({"wells": wells.cache.stats(), "traces": trace_cache.stats()})
+
 
-df = pd.read_pickle("/Users/jieyang/PycharmProjects/Shell_internship/Vibration_data/3D_data/trajectory_1f/Phoenix_3D_1f_Vib.pickle")
+## a live feed (a data_sources spec) aligned onto the path of VIB_LIVE_WELL and drawn as
+## ribbons in the 3D plot; without VIB_LIVE_START_MD it starts where the well's data starts.
+## Every server process reads the feed itself, so serve it with a single worker
+live = None
+if os.environ.get("VIB_LIVE_SOURCE") and os.environ.get("VIB_LIVE_WELL"):
+    live_well = os.environ["VIB_LIVE_WELL"]
+    live_start = os.environ.get("VIB_LIVE_START_MD")
+    if live_start is None:
+        live_start = wells.stats(live_well)["channels"].get("ASHK2", {}).get("first_depth")
+    live = AlignedTrack(make_source(os.environ["VIB_LIVE_SOURCE"]),
+                        Alignment(Trajectory.from_catalog(wells, live_well),
+                                  start_md = None if live_start is None else float(live_start)),
+                        ["ASHK2", "LSHK2", "WOB"])
+
+
+## timers, counters and gauges in the Prometheus text format; collected with VIB_METRICS=1
+metrics.gauge("well_cache_bytes", lambda: wells.cache.nbytes)
+metrics.gauge("trace_cache_bytes", lambda: trace_cache.nbytes)
+
+
+@app.server.route("/metrics")
+def metrics_text():
+    return flask.Response(metrics.render_text(), mimetype="text/plain")
+
+
+@app.server.before_request
+def start_request_timer():
+    flask.g.request_start = time.perf_counter()
+
+
+@app.server.after_request
+def stop_request_timer(response):
+    ##whole callback requests, so figure serialization is included
+    if metrics.enabled() and flask.request.path.endswith("/_dash-update-component"):
+        body = flask.request.get_json(silent=True) or {}
+        output = body.get("output", "").lstrip(".")
+        metrics.observe("callback_request", time.perf_counter() - flask.g.request_start, output=output)
+        metrics.count("callback_response_bytes", response.calculate_content_length() or 0, output=output)
+    return response
 
 
 styles = {
@@ -59,7 +139,7 @@ app.layout= html.Div([
 
                         dcc.Dropdown(
                             id = "wellname",
-                            options = [{"label": i, "value" : i} for i in df.keys()],
+                            options = [{"label": wells.summary(i), "value" : i} for i in wells.names()],
                             multi = True
                         ),
 
@@ -71,6 +151,16 @@ app.layout= html.Div([
                                 {"label": i, "value": i} for i in ["ASHK2", "LSHK2"]],
                             labelStyle={'display': 'inline-block'}
                         ),
+
+                        html.H6("Simplification tolerance (ft)"),
+
+                        dcc.Input(
+                            id="simplify_tol",
+                            type="number",
+                            value=1,
+                            min=0,
+                            step=0.5
+                        ),
                         html.Hr(),
 
                         html.Div(style = {"margin" : "0px"},
@@ -89,7 +179,17 @@ app.layout= html.Div([
                 className="nine columns",
                 children=html.Div([
                     dcc.Graph(id = "3d_plot",
-                              style={"height": "60vh", "width": "70vw"})
+                              style={"height": "60vh", "width": "70vw"}),
+                    ##geometry of both vib directions per loaded well lives in the browser;
+                    ##switching direction or the well selection is drawn client-side
+                    dcc.Store(id = "geometry_new"),
+                    dcc.Store(id = "geometry_all", data = {}),
+                    dcc.Store(id = "geometry_keys", data = {"tolerance": None, "wells": []}),
+                    ##the live track grows in the browser; each poll only fetches the new samples
+                    dcc.Interval(id = "live_interval", interval = 1000, disabled = live is None),
+                    dcc.Store(id = "live_new"),
+                    dcc.Store(id = "live_all", data = {}),
+                    dcc.Store(id = "live_keys", data = {"count": 0})
                 ])
             )
         ]
@@ -112,7 +212,7 @@ app.layout= html.Div([
 
                         dcc.Dropdown(
                             id = "wellname2",
-                            options = [{"label" : i, "value" : i} for i in df.keys()]
+                            options = [{"label" : wells.summary(i), "value" : i} for i in wells.names()]
                         )
                     ]
                 )
@@ -125,22 +225,97 @@ app.layout= html.Div([
                 ])
             )
         ]
+    ),
+
+    ##cross-well heatmap
+    html.Div(
+        style={
+            "height": "50vh",
+            "borderBottom": "thin lightgrey solid"
+        },
+        className="row",
+        children = [
+            html.Div(
+                className = "three columns",
+                children = html.Div(
+                    [
+                        html.H4("All wells"),
+                        html.H6("Bin by"),
+
+                        dcc.Dropdown(
+                            id = "fleet_pair",
+                            options = [{"label" : "%s / %s" % p, "value" : "%s|%s" % p} for p in PAIRS],
+                            value = "%s|%s" % PAIRS[0]
+                        ),
+
+                        html.H6("Vibration direction"),
+
+                        dcc.RadioItems(
+                            id = "fleet_vib",
+                            options = [{"label": i, "value": i} for i in ["ASHK2", "LSHK2"]],
+                            value = "ASHK2",
+                            labelStyle = {'display': 'inline-block'}
+                        ),
+
+                        html.H6("Statistic"),
+
+                        dcc.Dropdown(
+                            id = "fleet_stat",
+                            options = [{"label" : i, "value" : i} for i in ["mean", "p50", "p90", "p99", "count"]],
+                            value = "p90"
+                        )
+                    ]
+                )
+            ),
+            html.Div(
+                className = "nine columns",
+                children = html.Div([
+                    dcc.Graph(id = "fleet_heatmap",
+                              style = {"height" : "50vh", "width" : "70vw"})
+                ])
+            )
+        ]
     )
 
 ])
 
 
-def trace3d(dff, wellval,vib_direction):
-    ##create one trace for vertical well
-    #first_valid = int(dff[vib_direction].first_valid_index())
-    #last_valid = int(dff[vib_direction].last_valid_index())
-    sery = dff[vib_direction]
-    not_null_list = sery[pd.isnull(sery) == False].index.tolist()
-    first_valid = int(not_null_list[0])
-    last_valid = int(not_null_list[-1])
+@metrics.timed("trace3d")
+def trace3d(dff, wellval, stats, tolerance=0):
+    ##traces shared by both vib directions, plus the vibration ribbon heights per direction;
+    ##the browser builds the vibration ribbon of the chosen direction from the RPM line and them
+    ##valid span and RPM range come from the well index computed at ingest; the data section is
+    ##the union of the spans of the directions the well has, and without any the whole path is grey
+    directions = [vib for vib in VIB_DIRECTIONS if stats["channels"].get(vib, {}).get("count")]
+    if directions:
+        first_valid = min(stats["channels"][vib]["first"] for vib in directions)
+        last_valid = max(stats["channels"][vib]["last"] for vib in directions)
+        rpm_min = min(stats["spans"][vib]["Rotary RPM"]["min"] for vib in directions)
+        rpm_max = max(stats["spans"][vib]["Rotary RPM"]["max"] for vib in directions)
+    else:
+        first_valid = last_valid = len(dff) + 1
+        rpm_min, rpm_max = 0, 30
     dff1 = dff.iloc[:first_valid-1,:]
     dff2 = dff.iloc[last_valid+1:, :]
     dff3 = dff.iloc[first_valid:last_valid,:]
+
+    ##simplify the geometry before building the traces: every path within `tolerance` ft,
+    ##and in the data section the largest vibration/WOB of every RIBBON_PEAK_SPACING * tolerance
+    ##ft of MD is kept too, so the ribbons keep their peaks without fitting the noise
+    n_before = len(dff1) + len(dff2) + 5 * len(dff3)
+    dff1 = dff1.iloc[simplify_path(dff1[["N", "E", "V"]].values, tolerance)]
+    dff2 = dff2.iloc[simplify_path(dff2[["N", "E", "V"]].values, tolerance)]
+    rpm = dff3["Rotary RPM"].values
+    ribbons = [dff3[vib].values for vib in VIB_DIRECTIONS] + [dff3["Weight on Bit"].values]
+    rpm_turns = np.flatnonzero((rpm[1:] >= 30) != (rpm[:-1] >= 30))  # color changes at 30 rpm
+    keep = np.r_[rpm_turns, rpm_turns + 1,
+                 [f(v) for v in [rpm] + ribbons if not np.isnan(v).all() for f in (np.nanargmin, np.nanargmax)]]
+    if tolerance > 0:
+        keep = np.concatenate([keep] + [peak_indices(dff3.index.values, v, RIBBON_PEAK_SPACING * tolerance)
+                                        for v in ribbons])
+    dff3 = dff3.iloc[simplify_path(dff3[["N", "E", "V"]].values, tolerance, keep=keep.astype(int))]
+    n_after = len(dff1) + len(dff2) + 5 * len(dff3)
+
     trace0 = go.Scatter3d(
         x = dff1["N"],
         y = dff1["E"],
@@ -164,7 +339,8 @@ def trace3d(dff, wellval,vib_direction):
 
     #draw another traces for data available
     #calcualte the cutpoint
-    cutoff = (30 - min(dff3["Rotary RPM"]))/(max(dff3["Rotary RPM"]) - min(dff3["Rotary RPM"]))
+    cutoff = (30 - rpm_min)/(rpm_max - rpm_min)
+    i, j, k = ribbon_topology(dff3.shape[0])
     trace2 = go.Scatter3d(
         x = dff3["N"],
         y = dff3["E"],
@@ -179,89 +355,178 @@ def trace3d(dff, wellval,vib_direction):
         ),
         name=str(wellval + "-RPM")
     )
-    trace3 = go.Mesh3d(
-        x=np.concatenate([dff3["N"], dff3["N"]]),
-        y=np.concatenate([dff3["E"], dff3["E"]]),
-        z=np.concatenate([-dff3["V"], -dff3["V"] + dff3[vib_direction] * 10]),
-        i=np.asarray(list(range(dff3.shape[0] - 1)) + list(range(dff3.shape[0] - 1))),
-        j=np.asarray(list(range(dff3.shape[0], 2 * dff3.shape[0] - 1)) + list(range(dff3.shape[0] + 1, 2 * dff3.shape[0]))),
-        k=np.asarray(list(range(dff3.shape[0] + 1, 2 * dff3.shape[0])) + list(range(1, dff3.shape[0]))),
-        color="rgb(102,255,51)",
-        showscale=True,
-        name = str(wellval + "-"+vib_direction)
-    )
     trace4 = go.Mesh3d(
         x=np.concatenate([dff3["N"], dff3["N"]]),
         y=np.concatenate([dff3["E"], dff3["E"]]),
         z=np.concatenate([-dff3["V"] - dff3["Weight on Bit"] * 10, -dff3["V"] ]),
-        i=np.asarray(list(range(dff3.shape[0] - 1)) + list(range(dff3.shape[0] - 1))),
-        j=np.asarray(list(range(dff3.shape[0], 2 * dff3.shape[0] - 1)) + list(range(dff3.shape[0] + 1, 2 * dff3.shape[0]))),
-        k=np.asarray(list(range(dff3.shape[0] + 1, 2 * dff3.shape[0])) + list(range(1, dff3.shape[0]))),
+        i=i,
+        j=j,
+        k=k,
         color="rgb(255,102,102)",
         showscale=True,
         name = str( wellval + "-WOB")
     )
-    trace = [trace0, trace1, trace2, trace3, trace4]
-    return  trace
+    trace = [trace0, trace1, trace2, trace4]
+    heights = {vib: dff3[vib].values * 10 for vib in directions}
+    return  trace, heights, (n_before, n_after)
+
 
 
+def well_traces(val, tolerance):
+    metrics.count("well_requests", well=val, view="3d")
+    entry = trace_cache.get((val, tolerance))
+    if entry is None:
+        dff = wells.frame(val, ["N", "E", "V", "Rotary RPM", "Weight on Bit"] + VIB_DIRECTIONS)
+        entry = trace3d(dff, wellval=val, stats = wells.stats(val), tolerance = tolerance)
+        trace_cache.put((val, tolerance), entry)
+    return entry
 
-@app.callback(dash.dependencies.Output("3d_plot", "figure"),
+
+def trace_json(trace, uid):
+    ##a stable uid lets plotly match traces across selection changes instead of by position;
+    ##coordinates are rounded to 0.01 ft and ribbon triangles are rebuilt in the browser
+    data = trace.to_plotly_json()
+    data["uid"] = uid
+    for name in ("x", "y", "z"):
+        if name in data:
+            data[name] = np.round(np.asarray(data[name], dtype=float), 2)
+    if data["type"] == "mesh3d":
+        for name in ("i", "j", "k"):
+            data.pop(name, None)
+    return data
+
+
+@app.callback(dash.dependencies.Output("geometry_new", "data"),
               [dash.dependencies.Input("wellname", "value"),
-               dash.dependencies.Input("vib_direction", "value")]
+               dash.dependencies.Input("simplify_tol", "value")],
+              [dash.dependencies.State("geometry_keys", "data")]
+)
+@metrics.timed("load_geometry")
+def load_geometry(wellname, tolerance, keys):
+    ##only wells the browser does not hold yet are built and sent; the geometry both directions
+    ##share goes once, plus one array of vibration ribbon heights per direction
+    tolerance = float(tolerance or 0)
+    have = set(keys["wells"]) if keys and keys["tolerance"] == tolerance else set()
+    new = [val for val in wellname or [] if val not in have]
+    if not new:
+        raise dash.exceptions.PreventUpdate
+    geometry = {}
+    for val in new:
+        traces, heights, counts = well_traces(val, tolerance)
+        geometry[val] = {"data": [trace_json(t, "%s|%d" % (val, n)) for n, t in enumerate(traces)],
+                         "heights": {vib: np.round(np.nan_to_num(h), 2) for vib, h in heights.items()},
+                         "counts": counts, "ribbon": len(traces[2].x)}
+    return {"tolerance": tolerance, "wells": geometry}
+
+
+app.clientside_callback(
+    dash.dependencies.ClientsideFunction("vib3d", "merge_geometry"),
+    [dash.dependencies.Output("geometry_all", "data"),
+     dash.dependencies.Output("geometry_keys", "data")],
+    [dash.dependencies.Input("geometry_new", "data")],
+    [dash.dependencies.State("geometry_all", "data")]
 )
-def update_3dplot(wellname, vib_direction):
-    data = []
-    for val in wellname:
-        dff = df[val]["Vib"]
-        trace0 = trace3d(dff, wellval=val, vib_direction = vib_direction)
-        data = data + trace0
 
-    layout = go.Layout(
-        margin=dict(l=10, r=10, b=10, t=10),
-        showlegend=False,
-        scene=dict(
-            xaxis = dict(title = "N"),
-            yaxis = dict(title = "E"),
-            zaxis = dict(title = "TVD"))
-    )
+@app.callback(dash.dependencies.Output("live_new", "data"),
+              [dash.dependencies.Input("live_interval", "n_intervals")],
+              [dash.dependencies.State("live_keys", "data")]
+)
+@metrics.timed("live_track")
+def live_track(n_intervals, keys):
+    ##samples the browser already holds are not sent again; a restarted feed starts over
+    if live is None:
+        raise dash.exceptions.PreventUpdate
+    live.start()
+    start = keys["count"] if keys else 0
+    samples, total = live.since(start)
+    if start > total:
+        start = 0
+        samples, total = live.since(0)
+    if total == start:
+        raise dash.exceptions.PreventUpdate
+    data = {ch: np.round(values, 2) for ch, values in samples.items()}
+    data["start"] = start
+    return data
+
+
+app.clientside_callback(
+    dash.dependencies.ClientsideFunction("vib3d", "merge_live"),
+    [dash.dependencies.Output("live_all", "data"),
+     dash.dependencies.Output("live_keys", "data")],
+    [dash.dependencies.Input("live_new", "data")],
+    [dash.dependencies.State("live_all", "data")]
+)
 
-    fig = go.Figure(data = data, layout = layout)
-    return fig
+app.clientside_callback(
+    dash.dependencies.ClientsideFunction("vib3d", "render_3d"),
+    dash.dependencies.Output("3d_plot", "figure"),
+    [dash.dependencies.Input("geometry_all", "data"),
+     dash.dependencies.Input("wellname", "value"),
+     dash.dependencies.Input("vib_direction", "value"),
+     dash.dependencies.Input("live_all", "data")]
+)
 
 
 
+def downsample2d(dff, column):
+    idx = minmax_indices(dff[column].values, PLOT2D_WIDTH)
+    return dff.index[idx], dff[column].values[idx]
+
+
 @app.callback(dash.dependencies.Output("2d_plot", "figure"),
-              [dash.dependencies.Input("wellname2", "value")]
+              [dash.dependencies.Input("wellname2", "value"),
+               dash.dependencies.Input("2d_plot", "relayoutData")]
 )
-def trace2d(wellval):
-    dff = df[wellval]["Vib"]
-    first_valid = int(dff["ASHK2"].first_valid_index())
-    last_valid = int(dff["ASHK2"].last_valid_index())
-    dff = dff.iloc[first_valid:last_valid,:]
+@metrics.timed("trace2d")
+def trace2d(wellval, relayout):
+    ##autosize, y-only zooms and dragmode changes leave the depth data as it is
+    triggered = [t["prop_id"] for t in dash.callback_context.triggered]
+    if wellval is None or ("2d_plot.relayoutData" in triggered and "wellname2.value" not in triggered
+                           and not relayout_changes_x(relayout)):
+        raise dash.exceptions.PreventUpdate
+    metrics.count("well_requests", well=wellval, view="2d")
+    stats = wells.stats(wellval)
+    first_valid = stats["channels"]["ASHK2"]["first"]
+    last_valid = stats["channels"]["ASHK2"]["last"]
+    span = stats["spans"]["ASHK2"]
+    full = wells.frame(wellval, ["ASHK2", "LSHK2", "Rotary RPM", "Weight on Bit", "Gamma Ray"], first_valid, last_valid)
+
+    ##a zoom only re-fetches the visible depth interval; a new well starts unzoomed
+    x_range = None
+    if "wellname2.value" not in triggered:
+        x_range = relayout_x_range(relayout)
+    dff = full
+    if x_range is not None:
+        lo, hi = np.searchsorted(full.index.values, x_range)
+        dff = full.iloc[max(lo - 1, 0):hi + 1]
+    x1, y1 = downsample2d(dff, "ASHK2")
+    x2, y2 = downsample2d(dff, "LSHK2")
+    x3, y3 = downsample2d(dff, "Rotary RPM")
+    x4, y4 = downsample2d(dff, "Weight on Bit")
+    x5, y5 = downsample2d(dff, "Gamma Ray")
     trace1 = go.Scatter(
-        x=dff.index,
-        y=dff["ASHK2"],
+        x=x1,
+        y=y1,
         name="ASHK2"
     )
     trace2 = go.Scatter(
-        x = dff.index,
-        y = dff["LSHK2"],
+        x = x2,
+        y = y2,
         name = "LSHK2"
     )
     trace3 = go.Scatter(
-        x=dff.index,
-        y=dff["Rotary RPM"],
+        x=x3,
+        y=y3,
         name="Rotary RPM"
     )
     trace4 = go.Scatter(
-        x=dff.index,
-        y=dff["Weight on Bit"],
+        x=x4,
+        y=y4,
         name="Weight on Bit"
     )
     trace5 = go.Scatter(
-        x=dff.index,
-        y=dff["Gamma Ray"],
+        x=x5,
+        y=y5,
         name="Gamma Ray"
     )
     fig = tools.make_subplots(rows=5, cols=1, specs=[[{}], [{}], [{}], [{}], [{}]],
@@ -273,16 +538,52 @@ def trace2d(wellval):
     fig.append_trace(trace4, 4, 1)
     fig.append_trace(trace5, 5, 1)
 
-    fig["layout"]["yaxis1"].update(title = "ASHK2", range = [0,max(dff["ASHK2"])])
-    fig["layout"]["yaxis2"].update(title = "LSHK2", range = [0,max(dff["LSHK2"])])
-    fig["layout"]["yaxis3"].update(title = "RPM", range = [0,max(dff["Rotary RPM"])])
-    fig["layout"]["yaxis4"].update(title = "WOB", range = [0,max(dff["Weight on Bit"])])
-    fig["layout"]["yaxis5"].update(title = "Gamma Ray", range = [0,max(dff["Gamma Ray"])])
+    fig["layout"]["yaxis1"].update(title = "ASHK2", range = [0,span["ASHK2"]["max"]])
+    fig["layout"]["yaxis2"].update(title = "LSHK2", range = [0,span["LSHK2"]["max"]])
+    fig["layout"]["yaxis3"].update(title = "RPM", range = [0,span["Rotary RPM"]["max"]])
+    fig["layout"]["yaxis4"].update(title = "WOB", range = [0,span["Weight on Bit"]["max"]])
+    fig["layout"]["yaxis5"].update(title = "Gamma Ray", range = [0,span["Gamma Ray"]["max"]])
     fig["layout"]["xaxis1"].update(title = "Measure Depth")
+    if x_range is not None:
+        fig["layout"]["xaxis1"].update(range = list(x_range))
 
-    fig['layout'].update(height=500, width=1200, title= wellval, showlegend = False)
+    fig['layout'].update(height=500, width=PLOT2D_WIDTH, title= wellval, showlegend = False, uirevision = wellval)
     return fig
 
 
+def fleet_axis_title(name):
+    ##RPM and WOB beyond the fixed bin edges are counted in the first/last row and column
+    if name not in CLAMPED:
+        return name
+    return "%s (edge bins hold values outside %g-%g)" % (name, fleet.bins[name][0], fleet.bins[name][-1])
+
+
+@app.callback(dash.dependencies.Output("fleet_heatmap", "figure"),
+              [dash.dependencies.Input("fleet_pair", "value"),
+               dash.dependencies.Input("fleet_vib", "value"),
+               dash.dependencies.Input("fleet_stat", "value")]
+)
+@metrics.timed("fleet_heatmap")
+def fleet_heatmap(pair, vib, stat):
+    pair = tuple(pair.split("|"))
+    ##only wells without a cached partial are computed, the rest is merged from disk
+    fleet.update()
+    z = fleet.grid(pair, vib, stat)
+    trace = go.Heatmap(
+        x = fleet.centers(pair[1]),
+        y = fleet.centers(pair[0]),
+        z = z,
+        colorscale = "Viridis",
+        colorbar = dict(title = vib if stat == "count" else "%s %s" % (vib, stat))
+    )
+    layout = go.Layout(
+        margin = dict(l=60, r=10, b=40, t=30),
+        title = "%s of %s over %d wells" % (stat, vib, len(wells.names())),
+        xaxis = dict(title = fleet_axis_title(pair[1])),
+        yaxis = dict(title = fleet_axis_title(pair[0]), autorange = "reversed" if pair[0] == "MD" else True)
+    )
+    return go.Figure(data = [trace], layout = layout)
+
+
 if __name__ == "__main__":
     app.run_server(debug=True)
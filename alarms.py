@@ -0,0 +1,108 @@
+import json
+import operator
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+       "==": operator.eq, "!=": operator.ne}
+
+
+class AlarmRule(object):
+    """A named alarm over one or more channel conditions (all must hold).
+
+    Each condition is {"channel", "op", "value"} with an optional "clear"
+    threshold for hysteresis: the alarm raises once every condition holds
+    against "value" for `min_duration` seconds and clears once any condition
+    fails against "clear". `param` is the "group/child" parameter tree entry
+    it drives in vib_app, if any.
+    """
+
+    def __init__(self, name, conditions, min_duration=0, param=None):
+        self.name = name
+        self.conditions = conditions
+        self.min_duration = min_duration
+        self.param = param
+
+    @property
+    def channels(self):
+        return [cond["channel"] for cond in self.conditions]
+
+    def _test(self, chunk, key):
+        ok = None
+        for cond in self.conditions:
+            test = OPS[cond["op"]](np.asarray(chunk[cond["channel"]]), cond.get(key, cond["value"]))
+            ok = test if ok is None else ok & test
+        return ok
+
+
+def load_rules(path):
+    with open(path) as f:
+        return [AlarmRule(**rule) for rule in json.load(f)]
+
+
+class AlarmEngine(object):
+    """Evaluates every rule over whole sample batches and keeps per-rule state between batches.
+
+    Cleared alarms are recorded as events for event_table(); `max_events`
+    keeps only the most recent ones (0 records none, None keeps all).
+    """
+
+    def __init__(self, rules, time_channel="Time", max_events=None):
+        self.rules = list(rules)
+        self.time_channel = time_channel
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        self.state = {rule.name: None for rule in self.rules}
+        self._run_start = {rule.name: np.nan for rule in self.rules}  # start of the current raise run
+        self._open = {}  # rule -> onset time of the active event
+        self.events = deque(maxlen=self.max_events)  # [rule, onset, clear]
+
+    def _qualify(self, rule, t, raise_ok):
+        # raise_ok must have held continuously for min_duration seconds
+        if not rule.min_duration:
+            return raise_ok
+        prev = np.r_[not np.isnan(self._run_start[rule.name]), raise_ok[:-1]]
+        starts = raise_ok & ~prev
+        idx = np.maximum.accumulate(np.where(starts, np.arange(len(t)), -1))
+        run_start = np.where(idx >= 0, t[np.maximum(idx, 0)], self._run_start[rule.name])
+        self._run_start[rule.name] = run_start[-1] if raise_ok[-1] else np.nan
+        return raise_ok & (t - run_start >= rule.min_duration)
+
+    def process(self, chunk):
+        """Advance the rules covered by a batch; returns the rules whose state changed."""
+        t = np.asarray(chunk[self.time_channel], dtype=float)
+        if len(t) == 0:
+            return []
+        changed = []
+        for rule in self.rules:
+            # a batch may carry only some channels, e.g. model output arriving later
+            if not all(ch in chunk for ch in rule.channels):
+                continue
+            raise_ok = self._qualify(rule, t, rule._test(chunk, "value"))
+            clear = ~rule._test(chunk, "clear")
+            prev = bool(self.state[rule.name])
+            # hysteresis: raise wins, otherwise clear, otherwise keep the last state
+            ev = np.where(raise_ok, 1, np.where(clear, 0, -1))
+            idx = np.maximum.accumulate(np.where(ev >= 0, np.arange(len(ev)), -1))
+            state = np.where(idx >= 0, ev[np.maximum(idx, 0)], prev).astype(bool)
+            flips = np.flatnonzero(state != np.r_[prev, state[:-1]])
+            for i in flips:
+                if state[i]:
+                    self._open[rule.name] = t[i]
+                else:
+                    onset = self._open.pop(rule.name, np.nan)
+                    if self.max_events != 0:
+                        self.events.append([rule.name, onset, t[i]])
+            if self.state[rule.name] is None or state[-1] != prev:
+                changed.append(rule)
+            self.state[rule.name] = bool(state[-1])
+        return changed
+
+    def event_table(self):
+        """Onset/clear times of the recorded alarms; active alarms have a NaN clear time."""
+        rows = list(self.events) + [[name, onset, np.nan] for name, onset in self._open.items()]
+        return pd.DataFrame(rows, columns=["rule", "onset", "clear"]).sort_values("onset", ignore_index=True)
@@ -0,0 +1,160 @@
+"""Time-to-depth alignment of streamed LWD samples onto a well trajectory.
+
+The live feed is indexed by Time, the wells of the 3D explorer by MD with
+N/E/V columns. DepthTracker maps time to measured depth, from a bit depth
+channel when the feed carries one and by integrating ROP otherwise;
+Trajectory finds the survey interval of every depth with one searchsorted
+over the station depths and interpolates N/E/V inside it. Only the last
+sample is carried from one chunk to the next, so a chunk is aligned in
+O(chunk * log stations) and the history is never joined again.
+
+    alignment = Alignment(Trajectory.from_catalog(wells, "WELL 0"), start_md=9500)
+    for chunk in source.chunks():
+        aligned = alignment.update(chunk)   # the chunk plus MD, N, E, V
+"""
+import threading
+
+import numpy as np
+
+from lwd_buffer import LWDBuffer
+
+ALIGNED_CHANNELS = ["MD", "N", "E", "V"]
+DEPTH_CHANNEL = "Bit Depth"  # ft, used where present
+ROP_CHANNEL = "ROP"  # ft/hr, integrated over Time (s) otherwise
+
+
+class DepthTracker(object):
+    """Measured depth of every sample of a time-indexed feed.
+
+    Each sample is joined as of the last valid `depth_channel` value at or
+    before it and advanced by the ROP drilled since, so a feed without a depth
+    channel is dead-reckoned from `start_md` and gaps in one are bridged.
+    """
+
+    def __init__(self, start_md=0.0, depth_channel=DEPTH_CHANNEL, rop_channel=ROP_CHANNEL):
+        self.start_md = start_md
+        self.depth_channel = depth_channel
+        self.rop_channel = rop_channel
+        self.reset()
+
+    def reset(self):
+        self.last_time = None
+        self.last_md = float(self.start_md)
+
+    def update(self, chunk):
+        t = np.asarray(chunk["Time"], dtype=float)
+        n = len(t)
+        if n == 0:
+            return np.empty(0)
+        rop = np.asarray(chunk.get(self.rop_channel, np.zeros(n)), dtype=float)
+        rop = np.where(np.isfinite(rop) & (rop > 0), rop, 0.0)
+        previous = np.r_[t[0] if self.last_time is None else self.last_time, t[:-1]]
+        # depth drilled since the end of the previous chunk, each sample's ROP over the interval ending at it
+        drilled = np.cumsum(rop * np.clip(t - previous, 0, None) / 3600.0)
+        depth = np.asarray(chunk.get(self.depth_channel, np.full(n, np.nan)), dtype=float)
+        # as-of join: the last valid depth at or before each sample, -1 where it is the carried one
+        anchor = np.maximum.accumulate(np.where(np.isfinite(depth), np.arange(n), -1))
+        at = np.maximum(anchor, 0)
+        md = np.where(anchor >= 0, depth[at] + drilled - drilled[at], self.last_md + drilled)
+        self.last_time = t[-1]
+        self.last_md = md[-1]
+        return md
+
+
+class Trajectory(object):
+    """N/E/V along measured depth from survey stations, with a sorted interval index.
+
+    Depths between stations are interpolated linearly within their interval,
+    depths past the last station continue along the last interval (the bit
+    ahead of the survey) and depths above the first station clamp to it.
+    """
+
+    def __init__(self, md, north, east, vertical):
+        md = np.asarray(md, dtype=float)
+        coords = np.column_stack([north, east, vertical]).astype(float)
+        keep = np.isfinite(md) & np.isfinite(coords).all(axis=1)
+        md, coords = md[keep], coords[keep]
+        order = np.argsort(md, kind="stable")
+        md, coords = md[order], coords[order]
+        first = np.r_[True, np.diff(md) > 0]  # one station per depth
+        self.md, self.coords = md[first], coords[first]
+        if len(self.md) < 2:
+            raise ValueError("a trajectory needs at least two survey stations")
+        self.slope = np.diff(self.coords, axis=0) / np.diff(self.md)[:, None]
+
+    @classmethod
+    def from_frame(cls, frame, columns=("N", "E", "V")):
+        """From a depth-indexed frame such as a well of the explorer."""
+        return cls(frame.index.values, *(frame[c].values for c in columns))
+
+    @classmethod
+    def from_catalog(cls, wells, name):
+        return cls.from_frame(wells.frame(name, ["N", "E", "V"]))
+
+    def interval(self, md):
+        """Index i of the survey interval [md[i], md[i + 1]) holding each depth."""
+        return np.clip(np.searchsorted(self.md, md, side="right") - 1, 0, len(self.md) - 2)
+
+    def locate(self, md):
+        """(n, 3) array of N/E/V at the measured depths `md`."""
+        md = np.asarray(md, dtype=float)
+        i = self.interval(md)
+        offset = np.maximum(md - self.md[i], 0)
+        return self.coords[i] + offset[:, None] * self.slope[i]
+
+
+class Alignment(object):
+    """A DepthTracker and a Trajectory: update(chunk) returns the chunk with MD/N/E/V added."""
+
+    def __init__(self, trajectory, start_md=None, depth_channel=DEPTH_CHANNEL, rop_channel=ROP_CHANNEL):
+        self.trajectory = trajectory
+        self.depth = DepthTracker(trajectory.md[0] if start_md is None else start_md, depth_channel, rop_channel)
+
+    def reset(self):
+        self.depth.reset()
+
+    def update(self, chunk):
+        md = self.depth.update(chunk)
+        xyz = self.trajectory.locate(md)
+        aligned = dict(chunk)
+        aligned.update(zip(ALIGNED_CHANNELS, [md, xyz[:, 0], xyz[:, 1], xyz[:, 2]]))
+        return aligned
+
+
+class AlignedTrack(object):
+    """A feed read on a background thread, aligned chunk by chunk into a growing buffer.
+
+    since(k) hands out the samples after the first k, so a client that
+    already holds k samples only receives the new ones.
+    """
+
+    def __init__(self, source, alignment, channels=()):
+        self.source = source
+        self.alignment = alignment
+        self.buffer = LWDBuffer(["Time"] + ALIGNED_CHANNELS + [ch for ch in channels if ch not in ALIGNED_CHANNELS])
+        self.lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        # started on first use rather than at import, so each forked server process reads its own feed
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="aligned-track")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self.source.stop()
+
+    def _run(self):
+        for chunk in self.source.chunks():
+            aligned = self.alignment.update(chunk)
+            n = len(aligned["Time"])
+            samples = {ch: aligned[ch] if ch in aligned else np.full(n, np.nan) for ch in self.buffer.channels}
+            with self.lock:
+                self.buffer.append(samples)
+
+    def since(self, start):
+        """({channel: samples from number `start` on}, total samples)."""
+        with self.lock:
+            total = self.buffer.total
+            return {ch: self.buffer.view(ch)[start:].copy() for ch in self.buffer.channels}, total
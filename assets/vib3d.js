@@ -0,0 +1,161 @@
+// Client-side part of the 3D well plot (3D_plot.py).
+// The server sends each well once: the traces both vib directions share, and the
+// vibration ribbon heights of each direction. The browser keeps them in the
+// geometry_all store and builds the figure from it, so changing the direction or
+// the well selection needs no server round-trip.
+
+// Mesh3d i/j/k of a ribbon between two rows of n vertices, as well_geometry.ribbon_topology.
+function ribbonIndices(n) {
+    var i = [], j = [], k = [];
+    for (var a = 0; a < n - 1; a++) {
+        i.push(a); j.push(n + a); k.push(n + 1 + a);
+    }
+    for (var b = 0; b < n - 1; b++) {
+        i.push(b); j.push(n + 1 + b); k.push(1 + b);
+    }
+    return {i: i, j: j, k: k};
+}
+
+// Cached per n for the stored wells; the live track grows, so it builds its own.
+var ribbonTopology = (function() {
+    var cache = {};
+    return function(n) {
+        if (!cache[n]) {
+            cache[n] = ribbonIndices(n);
+        }
+        return cache[n];
+    };
+})();
+
+// Traces ready for plotting, built once per stored well and direction. Handing plotly
+// the same objects on every render lets Plotly.react skip the traces that did not change.
+var plotTraces = new WeakMap();
+
+function expandTraces(name, entry, vib_direction) {
+    if (!plotTraces.has(entry)) {
+        var topology = ribbonTopology(entry.ribbon);
+        plotTraces.set(entry, {
+            topology: topology,
+            shared: entry.data.map(function(trace) {
+                if (trace.type !== "mesh3d" || trace.i) {
+                    return trace;
+                }
+                return Object.assign({}, trace, {i: topology.i, j: topology.j, k: topology.k});
+            }),
+            directions: {}
+        });
+    }
+    var cached = plotTraces.get(entry);
+    if (!cached.directions[vib_direction]) {
+        // the vibration ribbon rises from the RPM line (trace 2) by the direction's heights;
+        // a well without data in this direction has none and is drawn without one
+        var line = entry.data[2], heights = entry.heights[vib_direction];
+        if (!heights) {
+            cached.directions[vib_direction] = cached.shared;
+            return cached.shared;
+        }
+        var ribbon = {type: "mesh3d", uid: name + "|" + vib_direction,
+                      x: line.x.concat(line.x), y: line.y.concat(line.y),
+                      z: line.z.concat(line.z.map(function(z, a) { return z + heights[a]; })),
+                      i: cached.topology.i, j: cached.topology.j, k: cached.topology.k,
+                      color: "rgb(102,255,51)", showscale: true, name: name + "-" + vib_direction};
+        cached.directions[vib_direction] = cached.shared.slice(0, 3).concat([ribbon], cached.shared.slice(3));
+    }
+    return cached.directions[vib_direction];
+}
+
+// Ribbons of the live track (alignment.AlignedTrack), drawn like trace3d draws a well:
+// the vibration above the path and the WOB below it, ten times exaggerated.
+function liveTraces(live, vib_direction) {
+    var n = live.N ? live.N.length : 0;
+    if (n < 2) {
+        return [];
+    }
+    var z = live.V.map(function(v) { return -v; });
+    var x = live.N.concat(live.N), y = live.E.concat(live.E);
+    var topology = ribbonIndices(n);
+    var offset = function(values, sign) {
+        return z.map(function(v, a) { return v + sign * 10 * (values[a] || 0); });
+    };
+    var traces = [{type: "scatter3d", uid: "live|path", x: live.N, y: live.E, z: z, mode: "lines",
+                   line: {color: "rgb(0, 102, 204)", width: 8}, name: "live"}];
+    if (live[vib_direction]) {
+        traces.push({type: "mesh3d", uid: "live|" + vib_direction, x: x, y: y, z: z.concat(offset(live[vib_direction], 1)),
+                     i: topology.i, j: topology.j, k: topology.k, color: "rgb(51, 153, 255)",
+                     name: "live-" + vib_direction});
+    }
+    if (live.WOB) {
+        traces.push({type: "mesh3d", uid: "live|WOB", x: x, y: y, z: offset(live.WOB, -1).concat(z),
+                     i: topology.i, j: topology.j, k: topology.k, color: "rgb(255, 153, 51)", name: "live-WOB"});
+    }
+    traces.push({type: "scatter3d", uid: "live|bit", x: [live.N[n - 1]], y: [live.E[n - 1]], z: [z[n - 1]],
+                 mode: "markers+text", text: ["MD " + Math.round(live.MD[n - 1])], textposition: "top center",
+                 marker: {size: 5, color: "rgb(0, 0, 0)"}, name: "bit"});
+    return traces;
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    vib3d: {
+        merge_geometry: function(incoming, stored) {
+            stored = stored || {};
+            var tolerance = stored.tolerance === undefined ? null : stored.tolerance;
+            var wells = Object.assign({}, stored.wells);
+            if (incoming) {
+                // geometry built with another tolerance is dropped
+                if (incoming.tolerance !== tolerance) {
+                    wells = {};
+                }
+                tolerance = incoming.tolerance;
+                Object.assign(wells, incoming.wells);
+            }
+            return [{tolerance: tolerance, wells: wells},
+                    {tolerance: tolerance, wells: Object.keys(wells)}];
+        },
+
+        merge_live: function(incoming, stored) {
+            // appends the samples the server sent after the first `start`; start 0 replaces the track
+            if (!incoming) {
+                return [stored || {}, {count: stored && stored.Time ? stored.Time.length : 0}];
+            }
+            var live = incoming.start ? Object.assign({}, stored) : {};
+            Object.keys(incoming).forEach(function(channel) {
+                if (channel !== "start") {
+                    live[channel] = (live[channel] || []).concat(incoming[channel]);
+                }
+            });
+            return [live, {count: live.Time.length}];
+        },
+
+        render_3d: function(geometry, wellnames, vib_direction, live) {
+            var data = [];
+            var before = 0, after = 0;
+            var wells = (geometry && geometry.wells) || {};
+            (wellnames || []).forEach(function(name) {
+                var entry = wells[name];
+                if (!entry || !vib_direction) {
+                    return;  // not loaded yet, or no direction chosen
+                }
+                data = data.concat(expandTraces(name, entry, vib_direction));
+                before += entry.counts[0];
+                after += entry.counts[1];
+            });
+            data = data.concat(liveTraces(live || {}, vib_direction));
+            var annotations = [];
+            if (after) {
+                annotations.push({x: 0, y: 1, xref: "paper", yref: "paper", showarrow: false, xanchor: "left",
+                                  text: "vertices " + before + " -> " + after +
+                                        " (" + (before / after).toFixed(1) + "x fewer)"});
+            }
+            return {
+                data: data,
+                layout: {
+                    margin: {l: 10, r: 10, b: 10, t: 10},
+                    showlegend: false,
+                    annotations: annotations,
+                    uirevision: "3d_plot",
+                    scene: {xaxis: {title: "N"}, yaxis: {title: "E"}, zaxis: {title: "TVD"}}
+                }
+            };
+        }
+    }
+});
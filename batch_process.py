@@ -0,0 +1,188 @@
+"""Offline batch processing of bit-run CSVs and well pickles.
+
+    python batch_process.py logs/ wells/ --out batch_results --processes 8
+
+Every CSV (one bit run) and every well of a pickle gets the alarm rule
+events, the valid spans and the channel statistics the apps show. Files are
+spread over a process pool and read in chunks of --chunk-rows. The results
+are written as two channel stores (see channel_store) under --out:
+stats/ with one row per (file, unit, scope, channel) and events/ with one
+row per alarm event.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from alarms import AlarmEngine, load_rules
+from channel_store import write_store
+from data_sources import to_chunk
+from well_index import SPAN_CHANNELS, StreamingStats
+
+ALARM_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alarm_rules.json")
+CSV_EXTENSIONS = (".csv",)
+PICKLE_EXTENSIONS = (".pickle", ".pkl")
+
+
+def find_inputs(paths):
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.endswith(".store"))
+            files.extend(os.path.join(root, n) for n in sorted(names)
+                         if n.lower().endswith(CSV_EXTENSIONS + PICKLE_EXTENSIONS))
+    return files
+
+
+def csv_units(path, chunk_rows):
+    # one bit run per CSV, on the Time axis the replay derives from the row number
+    def chunks():
+        first_row = 0
+        for df in pd.read_csv(path, chunksize=chunk_rows):
+            yield to_chunk(df, first_row)
+            first_row += len(df)
+    yield "", "Time", chunks
+
+
+def pickle_units(path, chunk_rows):
+    # a pickle can only be loaded whole; its wells are then processed in chunks along MD
+    wells = pd.read_pickle(path)
+    for name in list(wells.keys()):
+        frame = wells.pop(name)["Vib"]
+        numeric = [c for c in frame.columns if pd.api.types.is_numeric_dtype(frame[c])]
+
+        def chunks(frame=frame, numeric=numeric):
+            for start in range(0, len(frame), chunk_rows):
+                part = frame.iloc[start:start + chunk_rows]
+                chunk = {str(c): part[c].values.astype(float) for c in numeric}
+                chunk["MD"] = np.asarray(part.index.values, dtype=float)
+                yield chunk
+        yield str(name), "MD", chunks
+
+
+def summarize(chunks, axis, rules):
+    """Stats, span stats and alarm events of one unit, from two chunked passes.
+
+    Mirrors well_index.frame_stats: spans[c] covers rows [first, last) of span channel c.
+    """
+    engine = AlarmEngine(rules, time_channel=axis)
+    stats = {}
+    rows = 0
+    for chunk in chunks():
+        for ch, values in chunk.items():
+            if ch != axis:
+                stats.setdefault(ch, StreamingStats()).update(values, chunk[axis])
+        engine.process(chunk)
+        rows += len(chunk[axis])
+    channels = {ch: s.result() for ch, s in stats.items()}
+    ranges = {span: (channels[span]["first"], channels[span]["last"])
+              for span in SPAN_CHANNELS if channels.get(span, {}).get("count")}
+    spans = {span: {} for span in ranges}
+    if ranges:
+        offset = 0
+        for chunk in chunks():
+            n = len(chunk[axis])
+            for span, (first, last) in ranges.items():
+                lo, hi = max(first - offset, 0), min(last - offset, n)
+                for ch, values in chunk.items():
+                    if ch != axis:
+                        acc = spans[span].setdefault(ch, StreamingStats())
+                        if lo < hi:
+                            acc.update(values[lo:hi])
+            offset += n
+        spans = {span: {ch: s.result() for ch, s in acc.items()} for span, acc in spans.items()}
+    return {"rows": rows, "channels": channels, "spans": spans}, engine.event_table()
+
+
+def process_file(args):
+    path, chunk_rows, rules_path = args
+    rules = load_rules(rules_path)
+    units = csv_units if path.lower().endswith(CSV_EXTENSIONS) else pickle_units
+    start = time.time()
+    stats_rows, event_rows, rows = [], [], 0
+    try:
+        for unit, axis, chunks in units(path, chunk_rows):
+            stats, events = summarize(chunks, axis, rules)
+            rows += stats["rows"]
+            scopes = [("all", stats["channels"])] + sorted(stats["spans"].items())
+            for scope, channels in scopes:
+                for ch, s in channels.items():
+                    stats_rows.append(dict(s, file=path, unit=unit, scope=scope, channel=ch))
+            for rule, onset, clear in events.itertuples(index=False):
+                event_rows.append({"file": path, "unit": unit, "axis": axis, "rule": rule,
+                                   "onset": onset, "clear": clear})
+    except Exception as e:
+        return {"file": path, "error": "%s: %s" % (type(e).__name__, e), "rows": rows, "seconds": time.time() - start}
+    return {"file": path, "stats": stats_rows, "events": event_rows, "rows": rows, "seconds": time.time() - start}
+
+
+STATS_COLUMNS = ["file", "unit", "scope", "channel", "rows", "count", "first", "last",
+                 "first_depth", "last_depth", "min", "max", "p01", "p50", "p99"]
+EVENT_COLUMNS = ["file", "unit", "axis", "rule", "onset", "clear"]
+# kept as float64 in the result stores: exact to 2 ** 53 where float32 stops at 2 ** 24, NaN where missing
+EXACT_COLUMNS = ["rows", "count", "first", "last", "first_depth", "last_depth", "onset", "clear"]
+
+
+def run(paths, out, processes=None, chunk_rows=100000, rules_path=ALARM_RULES, max_tasks=20, log=sys.stderr):
+    files = find_inputs(paths)
+    total_bytes = float(sum(os.path.getsize(f) for f in files)) or 1.0
+    stats_rows, event_rows, errors = [], [], []
+    done_bytes = rows = 0
+    start = time.time()
+    # workers are replaced every max_tasks files, so memory held by one big pickle is returned
+    pool = multiprocessing.Pool(processes, maxtasksperchild=max_tasks)
+    try:
+        jobs = [(f, chunk_rows, rules_path) for f in files]
+        for i, result in enumerate(pool.imap_unordered(process_file, jobs), 1):
+            done_bytes += os.path.getsize(result["file"])
+            rows += result["rows"]
+            if "error" in result:
+                errors.append({"file": result["file"], "error": result["error"]})
+            else:
+                stats_rows.extend(result["stats"])
+                event_rows.extend(result["events"])
+            elapsed = time.time() - start
+            log.write("[%d/%d] %5.1f%%  %s  %.1fs  |  %.0f rows/s  %.1f MB/s%s\n" % (
+                i, len(files), 100 * done_bytes / total_bytes, result["file"], result["seconds"],
+                rows / elapsed, done_bytes / 2 ** 20 / elapsed, "  ERROR " + result["error"] if "error" in result else ""))
+    finally:
+        pool.close()
+        pool.join()
+    if not os.path.isdir(out):
+        os.makedirs(out)
+    write_store(pd.DataFrame(stats_rows, columns=STATS_COLUMNS), os.path.join(out, "stats"), exact=EXACT_COLUMNS)
+    write_store(pd.DataFrame(event_rows, columns=EVENT_COLUMNS), os.path.join(out, "events"), exact=EXACT_COLUMNS)
+    elapsed = time.time() - start
+    summary = {"files": len(files), "errors": errors, "rows": rows, "seconds": elapsed,
+               "rows_per_second": rows / elapsed if elapsed else None, "stats_rows": len(stats_rows),
+               "events": len(event_rows)}
+    with open(os.path.join(out, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=1)
+    log.write("%d files, %d rows in %.1fs (%.0f rows/s), %d events, %d errors -> %s\n" % (
+        len(files), rows, elapsed, summary["rows_per_second"] or 0, len(event_rows), len(errors), out))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alarm events, valid spans and channel stats of many bit-run logs")
+    parser.add_argument("inputs", nargs="+", help="CSV / pickle files or directories to search")
+    parser.add_argument("--out", default="batch_results", help="output directory")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="rows read at a time")
+    parser.add_argument("--rules", default=ALARM_RULES, help="alarm rules JSON")
+    parser.add_argument("--max-tasks", type=int, default=20, help="files per worker before it is replaced")
+    args = parser.parse_args(argv)
+    summary = run(args.inputs, args.out, args.processes, args.chunk_rows, args.rules, args.max_tasks)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
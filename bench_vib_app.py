@@ -0,0 +1,189 @@
+"""Headless replay benchmark for the vib_app streaming path.
+
+    python bench_vib_app.py --size 1m                 # offscreen Qt, synthetic log
+    python bench_vib_app.py --samples 50000 --source demo_data.csv
+    python bench_vib_app.py --size 10m --no-gui       # buffer, pyramids and alarms only
+    python bench_vib_app.py --suite                   # 10k / 1M / 10M, one process each
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SIZES = {"10k": 10000, "1m": 1000000, "10m": 10000000}
+
+
+def synthetic_chunks(n, batch, seed=0):
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, batch):
+        k = min(batch, n - start)
+        ashk = rng.gamma(2, 3, k)
+        lshk = rng.gamma(2, 1.5, k)
+        yield {"Time": (start + np.arange(k)) * 10.0,
+               "ROP": rng.uniform(20, 80, k), "WOB": rng.uniform(5, 25, k),
+               "SRPM": rng.uniform(60, 140, k), "DRPM": rng.uniform(40, 180, k),
+               "ASHK2": ashk, "LSHK2": lshk,
+               "pred_ASHK2": (ashk > 10).astype(float), "pred_LSHK2": (lshk > 5).astype(float)}
+
+
+def recorded_chunks(path, n, batch):
+    # loops the recording until n samples were produced, keeping Time increasing
+    from data_sources import ReplaySource
+    done = 0
+    while done < n:
+        offset = done * 10.0
+        for chunk in ReplaySource(path, batch_size=batch, interval=0).chunks():
+            k = min(len(chunk["Time"]), n - done)
+            chunk = {ch: values[:k] for ch, values in chunk.items()}
+            chunk["Time"] = chunk["Time"] + offset
+            yield chunk
+            done += k
+            if done >= n:
+                return
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def percentiles(values):
+    values = np.asarray(values) * 1000.0
+    if len(values) == 0:
+        return "-"
+    return "p50 %.3f  p90 %.3f  p99 %.3f  max %.3f ms" % tuple(np.percentile(values, [50, 90, 99, 100]))
+
+
+class HeadlessPipeline(object):
+    """The per-batch work of MainWindow.update without any widgets."""
+
+    def __init__(self, max_points=2000):
+        from lwd_buffer import LWDBuffer
+        from lwd_lod import MinMaxPyramid
+        from alarms import AlarmEngine, load_rules
+        from spectral import SpectralStage
+        from indicators import DrillingIndicators, INDICATORS
+        from vib_app import LWD_CHANNELS, PLOT_CHANNELS, ALARM_RULES
+        self.channels = LWD_CHANNELS
+        self.buffer = LWDBuffer(LWD_CHANNELS + list(INDICATORS))
+        self.indicators = DrillingIndicators()
+        self.lod = {ch: MinMaxPyramid() for ch in PLOT_CHANNELS}
+        self.alarm_engine = AlarmEngine(load_rules(ALARM_RULES), max_events=0)
+        self.spectral_stage = SpectralStage()
+        self.max_points = max_points
+
+    def update(self, chunk):
+        chunk = dict(chunk, **self.indicators.update(chunk))
+        self.buffer.append(chunk)
+        for ch, pyramid in self.lod.items():
+            pyramid.append(chunk["Time"], chunk[ch])
+        self.alarm_engine.process(chunk)
+        self.alarm_engine.process(self.spectral_stage.update(chunk))
+        time_view = self.buffer.view("Time")
+        for ch, pyramid in self.lod.items():
+            pyramid.select(time_view[0], time_view[-1], self.max_points, time_view, self.buffer.view(ch))
+
+
+def run(chunks, gui=True, render_every=1):
+    tick_times = []
+    render_times = {}
+    if gui:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication, QGraphicsScene
+        from PyQt5.QtGui import QImage, QPainter
+        from PyQt5.QtCore import QRectF
+        import vib_app
+        app = QApplication.instance() or QApplication(sys.argv[:1])
+        win = vib_app.MainWindow()
+        win.resize(1100, 800)
+        win.show()
+        app.processEvents()
+        scene = win.gui_widget.wit_lwd_log.scene()
+        render_times = {ch: [] for _, _, ch in win.lwd_tracks}
+        image = QImage(win.gui_widget.wit_lwd_log.size(), QImage.Format_ARGB32)
+        win.render_timer.stop()
+
+        def update(chunk):
+            # one frame per batch, so the curve updates are part of the tick
+            win.update(chunk)
+            win.redraw()
+    else:
+        pipeline = HeadlessPipeline()
+        update = pipeline.update
+
+    samples = 0
+    t_start = time.perf_counter()
+    for tick, chunk in enumerate(chunks):
+        t0 = time.perf_counter()
+        update(chunk)
+        tick_times.append(time.perf_counter() - t0)
+        samples += len(chunk["Time"])
+        if gui and tick % render_every == 0:
+            # paint each plot separately so the cost shows up per track; curve bounding
+            # rects overlap neighbouring plots, so only the measured curve is visible
+            for plt, curve, ch in win.lwd_tracks:
+                for _, other, _ in win.lwd_tracks:
+                    other.setVisible(other is curve)
+                painter = QPainter(image)
+                t0 = time.perf_counter()
+                QGraphicsScene.render(scene, painter, QRectF(), plt.sceneBoundingRect())
+                painter.end()
+                render_times[ch].append(time.perf_counter() - t0)
+            for _, curve, _ in win.lwd_tracks:
+                curve.setVisible(True)
+            app.processEvents()
+    elapsed = time.perf_counter() - t_start
+    if gui:
+        win.close()
+    return {"samples": samples, "ticks": len(tick_times), "elapsed": elapsed,
+            "tick_times": tick_times, "render_times": render_times, "peak_rss_mb": peak_rss_mb()}
+
+
+def report(label, result):
+    print("== %s ==" % label)
+    print("samples %d in %d ticks, %.2f s, %.0f samples/s" % (result["samples"], result["ticks"], result["elapsed"],
+                                                          result["samples"] / max(result["elapsed"], 1e-9)))
+    print("tick latency   %s" % percentiles(result["tick_times"]))
+    for ch, times in result["render_times"].items():
+        print("render %-7s %s" % (ch, percentiles(times)))
+    print("peak RSS %.1f MB" % result["peak_rss_mb"])
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the vib_app update loop")
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--samples", type=int, help="overrides --size")
+    parser.add_argument("--batch", type=int, default=1000, help="samples per tick")
+    parser.add_argument("--source", help="recorded CSV to loop instead of synthetic data")
+    parser.add_argument("--no-gui", action="store_true", help="skip Qt, time buffer/pyramid/alarm work only")
+    parser.add_argument("--render-every", type=int, default=10, help="render the plots every N ticks")
+    parser.add_argument("--suite", action="store_true", help="run every canned size in its own process")
+    args = parser.parse_args()
+
+    if args.suite:
+        # separate processes so peak RSS is per size
+        for size in ["10k", "1m", "10m"]:
+            cmd = [sys.executable, os.path.abspath(__file__), "--size", size, "--batch", str(args.batch),
+                   "--render-every", str(args.render_every)]
+            if args.no_gui:
+                cmd.append("--no-gui")
+            if args.source:
+                cmd += ["--source", args.source]
+            subprocess.check_call(cmd)
+        return
+
+    n = args.samples or SIZES[args.size]
+    if args.source:
+        chunks = recorded_chunks(args.source, n, args.batch)
+    else:
+        chunks = synthetic_chunks(n, args.batch)
+    result = run(chunks, gui=not args.no_gui, render_every=args.render_every)
+    report("%d samples, batch %d, %s" % (n, args.batch, "headless" if args.no_gui else "offscreen Qt"), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from well_index import frame_stats
+
+SCHEMA_FILE = "schema.json"
+WELLS_FILE = "wells.json"
+STORE_VERSION = 3
+
+
+def source_stamp(path):
+    st = os.stat(path)
+    return {"source": os.path.abspath(path), "mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp, path)
+
+
+def is_fresh(meta, source):
+    # a store is valid if it was built by this version from the unchanged source
+    return meta is not None and meta.get("version") == STORE_VERSION and meta.get("stamp") == source_stamp(source)
+
+
+def write_store(df, path, stamp=None, exact=()):
+    """Write `df` as one .npy file per column plus a schema header.
+
+    Numeric columns are stored as float32, or float64 for the columns named in
+    `exact` (counts, row numbers, times), everything else as categorical
+    codes (-1 for missing; int16, or int32 beyond 32767 categories) with the
+    categories kept in the schema.
+    Valid ranges and summary statistics of the channels (see well_index) are
+    computed here once and kept in the schema as "stats". Returns the stats.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    columns = []
+    for i, name in enumerate(df.columns):
+        col = df[name]
+        entry = {"name": str(name), "file": "c%04d.npy" % i}
+        if pd.api.types.is_numeric_dtype(col) or pd.api.types.is_bool_dtype(col):
+            entry["dtype"] = "float64" if name in exact else "float32"
+            np.save(os.path.join(path, entry["file"]), col.values.astype(entry["dtype"]))
+        else:
+            cat = pd.Categorical(col)
+            entry["dtype"] = "category"
+            entry["categories"] = [str(c) for c in cat.categories]
+            codes_dtype = np.int16 if len(cat.categories) <= np.iinfo(np.int16).max else np.int32
+            np.save(os.path.join(path, entry["file"]), cat.codes.astype(codes_dtype))
+        columns.append(entry)
+    index = {"name": df.index.name, "file": "index.npy"}
+    np.save(os.path.join(path, index["file"]), np.asarray(df.index.values))
+    stats = frame_stats(df)
+    _write_json(os.path.join(path, SCHEMA_FILE), {"version": STORE_VERSION, "stamp": stamp, "rows": len(df),
+                                                  "index": index, "columns": columns, "stats": stats})
+    return stats
+
+
+class ChannelStore(object):
+    """Read side of a store; channels are memory-mapped and read on demand."""
+
+    def __init__(self, path):
+        self.path = path
+        self.schema = _read_json(os.path.join(path, SCHEMA_FILE))
+        if self.schema is None:
+            raise IOError("no channel store at %s" % path)
+        self.rows = self.schema["rows"]
+        self.stats = self.schema["stats"]
+        self._columns = {c["name"]: c for c in self.schema["columns"]}
+        self._maps = {}
+
+    @property
+    def columns(self):
+        return [c["name"] for c in self.schema["columns"]]
+
+    def _map(self, name, entry):
+        if name not in self._maps:
+            self._maps[name] = np.load(os.path.join(self.path, entry["file"]), mmap_mode="r")
+        return self._maps[name]
+
+    def index(self, start=None, stop=None):
+        values = np.asarray(self._map(None, self.schema["index"])[start:stop])
+        return pd.Index(values, name=self.schema["index"]["name"])
+
+    def channel(self, name, start=None, stop=None):
+        """Rows [start, stop) of one channel: a float memmap slice or a Categorical."""
+        entry = self._columns[name]
+        values = self._map(name, entry)[start:stop]
+        if entry["dtype"] == "category":
+            return pd.Categorical.from_codes(np.asarray(values), categories=entry["categories"])
+        return values
+
+    def frame(self, columns=None, start=None, stop=None):
+        if columns is None:
+            columns = self.columns
+        data = {}
+        for name in columns:
+            values = self.channel(name, start, stop)
+            data[name] = values if isinstance(values, pd.Categorical) else np.asarray(values)
+        return pd.DataFrame(data, index=self.index(start, stop), columns=columns)
+
+
+def open_csv_store(csv_path, store_path=None):
+    """Open the store for a CSV, (re)building it when the CSV changed."""
+    store_path = store_path or csv_path + ".store"
+    if not is_fresh(_read_json(os.path.join(store_path, SCHEMA_FILE)), csv_path):
+        write_store(pd.read_csv(csv_path), store_path, stamp=source_stamp(csv_path))
+    return ChannelStore(store_path)
+
+
+def _well_dir(name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name))
+
+
+def build_well_stores(pickle_path, store_path=None):
+    """Make sure the per-well stores for a pickled {well: {"Vib": frame}} dict are current.
+
+    The pickle is only loaded when the stores are missing or stale. Returns the
+    store directory and the wells.json catalog (name, directory, rows,
+    columns and channel stats of every well).
+    """
+    store_path = store_path or os.path.splitext(pickle_path)[0] + ".store"
+    meta = _read_json(os.path.join(store_path, WELLS_FILE))
+    if not is_fresh(meta, pickle_path):
+        wells = pd.read_pickle(pickle_path)
+        if os.path.isdir(store_path):
+            shutil.rmtree(store_path)
+        os.makedirs(store_path)
+        entries = []
+        for name in wells.keys():
+            frame = wells[name]["Vib"]
+            entry = {"name": name, "dir": "%04d_%s" % (len(entries), _well_dir(name)),
+                     "rows": len(frame), "columns": [str(c) for c in frame.columns]}
+            entry["stats"] = write_store(frame, os.path.join(store_path, entry["dir"]))
+            entries.append(entry)
+        del wells
+        meta = {"version": STORE_VERSION, "stamp": source_stamp(pickle_path), "wells": entries}
+        _write_json(os.path.join(store_path, WELLS_FILE), meta)
+    return store_path, meta
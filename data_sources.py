@@ -0,0 +1,218 @@
+import argparse
+import io
+import os
+import socket
+import time
+
+import numpy as np
+import pandas as pd
+
+from channel_store import open_csv_store
+
+SAMPLE_INTERVAL = 10  # seconds between LWD samples
+PRED_CHANNELS = ["pred_ASHK2", "pred_LSHK2"]
+MIN_SLEEP = 0.02  # a fast replay sends bigger batches rather than sleeping less than this
+
+
+def to_chunk(df, first_row=0, sample_interval=SAMPLE_INTERVAL):
+    """Turn a frame of LWD rows into a batch {channel: float ndarray}.
+
+    Predictions become 1.0 ("Top") / 0.0 and a Time channel is derived from the
+    row number when the source does not carry one.
+    """
+    chunk = {}
+    for col in df.columns:
+        if col in PRED_CHANNELS:
+            chunk[col] = (df[col].values == "Top").astype(float)
+        else:
+            chunk[col] = pd.to_numeric(df[col], errors="coerce").values.astype(float)
+    if "Time" not in chunk:
+        chunk["Time"] = (first_row + np.arange(len(df))) * float(sample_interval)
+    return chunk
+
+
+def concat_chunks(chunks):
+    """Join consecutive batches into one; channels missing from a batch are NaN there."""
+    if len(chunks) == 1:
+        return chunks[0]
+    names = []
+    for chunk in chunks:
+        names.extend(ch for ch in chunk if ch not in names)
+    sizes = [len(next(iter(chunk.values()))) for chunk in chunks]
+    return {ch: np.concatenate([chunk[ch] if ch in chunk else np.full(n, np.nan) for chunk, n in zip(chunks, sizes)])
+            for ch in names}
+
+
+class DataSource(object):
+    """A stream of sample batches; `chunks()` blocks until data is available."""
+
+    def __init__(self):
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def chunks(self):
+        raise NotImplementedError
+
+
+class ReplaySource(DataSource):
+    """Replays a recorded CSV, `batch_size` rows every `interval` seconds times `speed`.
+
+    The CSV is converted once into a channel store next to it and replayed
+    from the memory-mapped channels afterwards. `speed` may be changed while
+    replaying; when a batch would be due sooner than MIN_SLEEP, several are
+    sent together instead.
+    """
+
+    def __init__(self, path, batch_size=1, interval=0.2, read_size=10000, speed=1.0):
+        super(ReplaySource, self).__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.read_size = read_size
+        self.speed = speed
+
+    def chunks(self):
+        store = open_csv_store(self.path)
+        row = 0
+        next_time = time.time()
+        block, block_start = None, 0
+        while row < store.rows:
+            if self._stopped:
+                return
+            period = self.interval / float(self.speed)
+            n = self.batch_size * (max(1, int(np.ceil(MIN_SLEEP / period))) if period else 1)
+            # read the store piecewise so only the replayed range is paged in
+            if block is None or row >= block_start + len(block):
+                block_start = row
+                block = store.frame(start=row, stop=row + max(self.read_size, n))
+            df = block.iloc[row - block_start:row - block_start + n]
+            yield to_chunk(df, first_row=row)
+            row += len(df)
+            if period:
+                next_time += period * len(df) / float(self.batch_size)
+                time.sleep(max(next_time - time.time(), 0))
+
+
+class _LineSource(DataSource):
+    """Shared parsing for line-oriented CSV streams: a header line, then rows."""
+
+    def __init__(self, max_batch=1000):
+        super(_LineSource, self).__init__()
+        self.max_batch = max_batch
+        self._header = None
+        self._pending = b""
+        self._row = 0
+
+    def _parse(self, data):
+        # returns a chunk for the complete lines in `data`, keeps the partial tail
+        data = self._pending + data
+        end = data.rfind(b"\n") + 1
+        self._pending = data[end:]
+        lines = data[:end]
+        if self._header is None:
+            if not lines:
+                return None
+            header, _, lines = lines.partition(b"\n")
+            self._header = header.decode().strip()
+        if not lines.strip():
+            return None
+        text = self._header + "\n" + lines.decode()
+        df = pd.read_csv(io.StringIO(text))
+        chunk = to_chunk(df, first_row=self._row)
+        self._row += len(df)
+        return chunk
+
+
+class CsvTailSource(_LineSource):
+    """Follows a CSV file that is still being written (like `tail -f`)."""
+
+    def __init__(self, path, poll_interval=0.2, max_batch=1000):
+        super(CsvTailSource, self).__init__(max_batch)
+        self.path = path
+        self.poll_interval = poll_interval
+
+    def chunks(self):
+        while not os.path.exists(self.path):
+            if self._stopped:
+                return
+            time.sleep(self.poll_interval)
+        with open(self.path, "rb") as f:
+            while not self._stopped:
+                data = f.read(self.max_batch * 128)
+                if not data:
+                    time.sleep(self.poll_interval)
+                    continue
+                chunk = self._parse(data)
+                if chunk is not None:
+                    yield chunk
+
+
+class TcpLineSource(_LineSource):
+    """Reads CSV lines from a TCP feed, e.g. the stand-in started by `serve`."""
+
+    def __init__(self, host="127.0.0.1", port=5555, timeout=0.5, max_batch=1000):
+        super(TcpLineSource, self).__init__(max_batch)
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def chunks(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.settimeout(self.timeout)  # wake up regularly to honour stop()
+        try:
+            while not self._stopped:
+                try:
+                    data = sock.recv(self.max_batch * 128)
+                except socket.timeout:
+                    continue
+                if not data:
+                    break
+                chunk = self._parse(data)
+                if chunk is not None:
+                    yield chunk
+        finally:
+            sock.close()
+
+
+def serve(path, host="127.0.0.1", port=5555, rate=5.0):
+    """Local stand-in for a rig feed: streams the rows of `path` at `rate` lines/s."""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    print("serving %s on %s:%d" % (path, host, port))
+    conn, _ = server.accept()
+    try:
+        with open(path, "rb") as f:
+            conn.sendall(f.readline())
+            for line in f:
+                conn.sendall(line)
+                if rate:
+                    time.sleep(1.0 / rate)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        conn.close()
+        server.close()
+
+
+def make_source(spec, **kwargs):
+    """Build a source from a spec: "tail:<csv>", "tcp:<host>:<port>" or a CSV path to replay."""
+    if spec.startswith("tail:"):
+        return CsvTailSource(spec[len("tail:"):], **kwargs)
+    if spec.startswith("tcp:"):
+        host, port = spec[len("tcp:"):].rsplit(":", 1)
+        return TcpLineSource(host, int(port), **kwargs)
+    return ReplaySource(spec, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream an LWD CSV over TCP")
+    parser.add_argument("path")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5555)
+    parser.add_argument("--rate", type=float, default=5.0, help="lines per second, 0 for no pacing")
+    args = parser.parse_args()
+    serve(args.path, args.host, args.port, args.rate)
@@ -0,0 +1,53 @@
+import re
+
+import numpy as np
+
+_RANGE_KEY = re.compile(r"^xaxis\d*\.range(\[[01]\])?$")
+_X_KEY = re.compile(r"^xaxis\d*\.(range(\[[01]\])?|autorange)$")
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the min and max sample of each of `n_buckets` equal buckets, in order.
+
+    Keeps every peak and trough at the pixel scale, so a line drawn through
+    the returned points looks like the full-resolution line. Short inputs
+    come back unchanged; NaNs are skipped.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(size * (-(-n // size)), np.nan)
+    padded[:n] = y
+    rows = padded.reshape(-1, size)
+    empty = np.isnan(rows).all(axis=1)
+    lo = np.argmin(np.where(np.isnan(rows), np.inf, rows), axis=1)
+    hi = np.argmax(np.where(np.isnan(rows), -np.inf, rows), axis=1)
+    base = np.arange(len(rows)) * size
+    idx = np.c_[base + np.minimum(lo, hi), base + np.maximum(lo, hi)][~empty].ravel()
+    return np.unique(np.r_[0, idx, n - 1])
+
+
+def relayout_changes_x(relayout):
+    """Whether a plotly relayoutData zooms, pans or resets an x axis."""
+    return any(_X_KEY.match(key) for key in (relayout or {}))
+
+
+def relayout_x_range(relayout):
+    """The [x0, x1] a plotly relayoutData zoomed to, or None for autorange/no zoom."""
+    if not relayout:
+        return None
+    bounds = {}
+    for key, value in relayout.items():
+        if not _RANGE_KEY.match(key):
+            continue
+        if key.endswith("[0]"):
+            bounds[0] = value
+        elif key.endswith("[1]"):
+            bounds[1] = value
+        else:
+            bounds[0], bounds[1] = value
+    if len(bounds) != 2:
+        return None
+    return float(bounds[0]), float(bounds[1])
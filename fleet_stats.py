@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from channel_store import ChannelStore
+
+VIB_CHANNELS = ["ASHK2", "LSHK2"]
+## bin edges shared by every well, so partial aggregates of different wells can simply be added.
+## MD reaches past the deepest vibration sample of the catalog (see FleetStats.bins); RPM and WOB
+## are fixed and values beyond them are counted in the first/last bin
+BINS = {"MD": np.arange(0, 30001, 500.0),
+        "Rotary RPM": np.arange(0, 301, 10.0),
+        "Weight on Bit": np.arange(0, 60.1, 2.5)}
+CLAMPED = ["Rotary RPM", "Weight on Bit"]
+MD_EXTENT_STEP = 5000.0  # the MD range grows in these steps, so a slightly deeper well rarely changes the edges
+PAIRS = [("MD", "Rotary RPM"), ("MD", "Weight on Bit"), ("Rotary RPM", "Weight on Bit")]
+VALUE_EDGES = np.arange(0, 50.1, 0.5)  # vibration histogram per cell, last bin catches overflow
+PARTIAL_VERSION = 2  # part of the cache key, bumped when partials are computed differently
+
+
+def _bin(values, edges):
+    # out-of-range values land in the edge bins rather than being dropped; NaN gets -1
+    idx = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    return np.where(np.isnan(values), -1, idx)
+
+
+def well_partial(store_path, bins=BINS):
+    """Mergeable aggregates of one well: per (pair, vib) cell counts, sums and a value histogram."""
+    store = ChannelStore(store_path)
+    columns = {"MD": np.asarray(store.index(), dtype=float)}
+    for name in ["Rotary RPM", "Weight on Bit"] + VIB_CHANNELS:
+        columns[name] = np.asarray(store.channel(name), dtype=float) if name in store.columns else \
+            np.full(store.rows, np.nan)
+    nv = len(VALUE_EDGES)
+    vbin = {vib: np.minimum(_bin(np.maximum(columns[vib], 0), np.r_[VALUE_EDGES, np.inf]), nv - 1)
+            for vib in VIB_CHANNELS}
+    out = {}
+    for a, b in PAIRS:
+        ia, ib = _bin(columns[a], bins[a]), _bin(columns[b], bins[b])
+        na, nb = len(bins[a]) - 1, len(bins[b]) - 1
+        for vib in VIB_CHANNELS:
+            ok = (ia >= 0) & (ib >= 0) & ~np.isnan(columns[vib])
+            cell = ia[ok] * nb + ib[ok]
+            key = "%s|%s|%s" % (a, b, vib)
+            out[key + "|hist"] = np.bincount(cell * nv + vbin[vib][ok], minlength=na * nb * nv) \
+                .reshape(na, nb, nv).astype(np.int32)
+            out[key + "|sum"] = np.bincount(cell, weights=columns[vib][ok], minlength=na * nb).reshape(na, nb)
+    return out
+
+
+def _compute(args):
+    store_path, out_path, bins = args
+    partial = well_partial(store_path, bins)
+    # a unique temp file, so concurrent computations of the same well cannot collide
+    fd, tmp_path = tempfile.mkstemp(suffix=".npz", dir=os.path.dirname(out_path))
+    os.close(fd)
+    try:
+        np.savez_compressed(tmp_path, **partial)
+        os.replace(tmp_path, out_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return out_path
+
+
+class FleetStats(object):
+    """Cross-well vibration statistics binned by depth, RPM and WOB.
+
+    Each well's partial aggregate is computed once in a process pool and
+    cached on disk under a fingerprint of its catalog stats, so an unchanged
+    well is never recomputed, even after the stores are rebuilt. Merged
+    totals are kept in memory and only the new wells' partials are added
+    when the catalog grows. update() and grid() may be called from several
+    request threads at once.
+    """
+
+    def __init__(self, catalog, cache_dir=None, processes=None):
+        self.catalog = catalog
+        self.cache_dir = cache_dir or catalog.store_path.rstrip(os.sep) + ".fleet"
+        self.processes = processes
+        self.merged = None
+        self.bins = None
+        self._merged_keys = set()
+        self._lock = threading.Lock()
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def _bins(self):
+        # MD edges from the deepest sample with vibration data in the catalog
+        depths = [ch["last_depth"] for name in self.catalog.names()
+                  for vib, ch in self.catalog.stats(name)["channels"].items() if vib in VIB_CHANNELS and ch.get("count")]
+        top = max([BINS["MD"][-1]] + [np.floor(d / MD_EXTENT_STEP + 1) * MD_EXTENT_STEP for d in depths])
+        bins = dict(BINS)
+        bins["MD"] = np.arange(0, top + 1, BINS["MD"][1] - BINS["MD"][0])
+        return bins
+
+    def _key(self, name):
+        stats = json.dumps(self.catalog.stats(name), sort_keys=True)
+        return hashlib.sha1(("%s|%d|%g|%s" % (name, PARTIAL_VERSION, self.bins["MD"][-1], stats)).encode()).hexdigest()
+
+    def update(self):
+        with self._lock:
+            self._update()
+        return self
+
+    def _update(self):
+        bins = self._bins()
+        if self.bins is None or not np.array_equal(bins["MD"], self.bins["MD"]):
+            # a deeper well widened the MD range: every partial is recomputed on the new edges
+            self.bins, self.merged, self._merged_keys = bins, None, set()
+        keys = {self._key(name): name for name in self.catalog.names()}
+        if not self._merged_keys <= set(keys):
+            # a well changed or disappeared: merge again from the cached partials
+            self.merged, self._merged_keys = None, set()
+        jobs = []
+        for key, name in keys.items():
+            out_path = os.path.join(self.cache_dir, key + ".npz")
+            if not os.path.exists(out_path):
+                jobs.append((os.path.join(self.catalog.store_path, self.catalog.info(name)["dir"]), out_path, self.bins))
+        if jobs:
+            with ProcessPoolExecutor(self.processes) as pool:
+                list(pool.map(_compute, jobs))
+        for key in set(keys) - self._merged_keys:
+            with np.load(os.path.join(self.cache_dir, key + ".npz")) as partial:
+                if self.merged is None:
+                    self.merged = {k: partial[k].astype(np.float64 if k.endswith("|sum") else np.int64)
+                                   for k in partial.files}
+                else:
+                    for k in partial.files:
+                        self.merged[k] += partial[k]
+            self._merged_keys.add(key)
+
+    def grid(self, pair, vib, stat="p50"):
+        """2D grid of `stat` ("count", "mean" or "pNN") of `vib` over the bins of `pair`."""
+        if self.merged is None:
+            self.update()
+        key = "%s|%s|%s" % (pair[0], pair[1], vib)
+        with self._lock:
+            hist = self.merged[key + "|hist"].copy()
+            total = self.merged[key + "|sum"].copy()
+        count = hist.sum(axis=-1).astype(float)
+        if stat == "count":
+            return count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if stat == "mean":
+                return np.where(count > 0, total / count, np.nan)
+            # quantile from the cumulative histogram, linear within the bin
+            q = float(stat[1:]) / 100.0
+            cdf = np.cumsum(hist, axis=-1) / count[..., None]
+            b = np.minimum((cdf < q).sum(axis=-1), len(VALUE_EDGES) - 1)
+            below = np.where(b > 0, np.take_along_axis(cdf, np.maximum(b - 1, 0)[..., None], -1)[..., 0], 0)
+            inside = np.take_along_axis(cdf, b[..., None], -1)[..., 0] - below
+            frac = np.clip(np.where(inside > 0, (q - below) / inside, 0), 0, 1)
+            width = np.diff(np.r_[VALUE_EDGES, VALUE_EDGES[-1] + 0.5])
+            return np.where(count > 0, VALUE_EDGES[b] + frac * width[b], np.nan)
+
+    def centers(self, name):
+        if self.bins is None:
+            self.update()
+        edges = self.bins[name]
+        return (edges[:-1] + edges[1:]) / 2
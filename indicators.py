@@ -0,0 +1,144 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+## derived channel -> plot label
+INDICATORS = OrderedDict([("ASHK2_rms", "ASHK RMS (G)"), ("ASHK2_std", "ASHK Std (G)"),
+                          ("LSHK2_rms", "LSHK RMS (G)"), ("LSHK2_std", "LSHK Std (G)"),
+                          ("SSI", "Stick-Slip Index"), ("MSE", "MSE (ksi)")])
+BIT_DIAMETER = 6.125  # in, the hole size of the BHA configuration
+BIT_FRICTION = 0.25  # bit-specific coefficient of sliding friction in Pessier's MSE
+
+
+class RollingMoments(object):
+    """Count, sum and sum of squares of the last `window` samples, updated in O(1) per sample.
+
+    The samples leaving the window are read from a ring of the last `window`
+    values, so a batch costs O(batch) no matter how long the stream is. The
+    running sums are recomputed from the ring once per `window` samples to
+    keep rounding errors from accumulating. NaNs are not counted.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._ring = np.full(self.window, np.nan)
+        self._pos = 0
+        self._n = self._s = self._q = 0.0
+        self._since = 0
+
+    def update(self, values):
+        """Window count, sum and sum of squares at every sample of the batch."""
+        x = np.asarray(values, dtype=float)
+        b, w = len(x), self.window
+        if b == 0:
+            return np.empty(0), np.empty(0), np.empty(0)
+        pos = (self._pos + np.arange(b)) % w
+        # x[i] pushes out the ring slot it overwrites, or x[i - w] within the batch
+        out = np.r_[self._ring[pos[:w]], x[:max(b - w, 0)]]
+        xin, xout = np.nan_to_num(x), np.nan_to_num(out)
+        n = self._n + np.cumsum(~np.isnan(x)) - np.cumsum(~np.isnan(out))
+        s = self._s + np.cumsum(xin - xout)
+        q = self._q + np.cumsum(xin * xin - xout * xout)
+        self._ring[pos[-w:]] = x[-w:]
+        self._pos = (self._pos + b) % w
+        self._n, self._s, self._q = n[-1], s[-1], q[-1]
+        self._since += b
+        if self._since >= w:
+            ring = self._ring[~np.isnan(self._ring)]
+            self._n, self._s, self._q = float(len(ring)), ring.sum(), (ring * ring).sum()
+            self._since = 0
+        return n, s, q
+
+    def mean_std_rms(self, values):
+        n, s, q = self.update(values)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            n = np.where(n > 0, n, np.nan)
+            mean = s / n
+            return mean, np.sqrt(np.maximum(q / n - mean * mean, 0)), np.sqrt(np.maximum(q / n, 0))
+
+
+class RollingExtrema(object):
+    """Min and max of the last `window` samples via monotonic deques, amortized O(1) per sample."""
+
+    def __init__(self, window):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._lo = deque()  # (sample number, value), values increasing
+        self._hi = deque()  # values decreasing
+        self._i = 0
+
+    def update(self, values):
+        lo, hi = self._lo, self._hi
+        out_lo = np.full(len(values), np.nan)
+        out_hi = np.full(len(values), np.nan)
+        for k, v in enumerate(np.asarray(values, dtype=float).tolist()):
+            i = self._i + k
+            if v == v:
+                while lo and lo[-1][1] >= v:
+                    lo.pop()
+                lo.append((i, v))
+                while hi and hi[-1][1] <= v:
+                    hi.pop()
+                hi.append((i, v))
+            while lo and lo[0][0] <= i - self.window:
+                lo.popleft()
+            while hi and hi[0][0] <= i - self.window:
+                hi.popleft()
+            if lo:
+                out_lo[k] = lo[0][1]
+                out_hi[k] = hi[0][1]
+        self._i += len(values)
+        return out_lo, out_hi
+
+
+def mechanical_specific_energy(wob, rpm, rop, bit_diameter=BIT_DIAMETER, friction=BIT_FRICTION):
+    """Pessier's MSE in ksi from WOB (klbf), bit RPM and ROP (ft/h).
+
+    MSE = WOB / A + 13.33 * mu * RPM * WOB / (D * ROP), with torque estimated
+    from WOB through the bit friction coefficient mu.
+    """
+    wob = np.asarray(wob, dtype=float) * 1000.0
+    rop = np.asarray(rop, dtype=float)
+    area = np.pi * bit_diameter ** 2 / 4.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mse = wob / area + 13.33 * friction * np.asarray(rpm, dtype=float) * wob / (bit_diameter * np.where(rop > 0, rop, np.nan))
+    return mse / 1000.0
+
+
+class DrillingIndicators(object):
+    """Rolling drilling-dynamics channels computed from each sample batch.
+
+    update() returns {channel: values} aligned with the batch for every
+    channel in INDICATORS; windows are in samples and span batch boundaries.
+    """
+
+    def __init__(self, window=30, bit_diameter=BIT_DIAMETER, friction=BIT_FRICTION):
+        self.window = window
+        self.bit_diameter = bit_diameter
+        self.friction = friction
+        self.shock = {ch: RollingMoments(window) for ch in ["ASHK2", "LSHK2"]}
+        self.drpm_moments = RollingMoments(window)
+        self.drpm_extrema = RollingExtrema(window)
+        self.mse_moments = RollingMoments(window)
+
+    def reset(self):
+        for acc in list(self.shock.values()) + [self.drpm_moments, self.drpm_extrema, self.mse_moments]:
+            acc.reset()
+
+    def update(self, chunk):
+        out = {}
+        for ch, acc in self.shock.items():
+            _, out[ch + "_std"], out[ch + "_rms"] = acc.mean_std_rms(chunk[ch])
+        # stick-slip severity: downhole RPM swing relative to its mean over the window
+        mean, _, _ = self.drpm_moments.mean_std_rms(chunk["DRPM"])
+        lo, hi = self.drpm_extrema.update(chunk["DRPM"])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out["SSI"] = np.where(mean > 0, (hi - lo) / mean, np.nan)
+        mse = mechanical_specific_energy(chunk["WOB"], chunk["DRPM"], chunk["ROP"], self.bit_diameter, self.friction)
+        out["MSE"], _, _ = self.mse_moments.mean_std_rms(mse)
+        return out
@@ -0,0 +1,171 @@
+"""Local load test of the explorer's server callbacks as the worker count grows.
+
+    python load_test.py --workers 1 2 4 8 --duration 20 --concurrency 16
+    python load_test.py --url http://127.0.0.1:8050 --duration 20   # an already running server
+
+For every worker count a gunicorn server (serve.py) is started on a free
+port, clients post a mix of 2D-plot, 3D-geometry and heatmap callback
+requests for random wells for --duration seconds, and the latency
+percentiles per callback and the overall requests/s are reported.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from bench_vib_app import percentiles
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def callback_payload(output, inputs, state=(), changed=None):
+    # the body dash-renderer posts to /_dash-update-component
+    component, prop = output.split(".")
+    ids = [{"id": i.split(".")[0], "property": i.split(".")[1], "value": v} for i, v in inputs]
+    return {"output": output, "outputs": {"id": component, "property": prop}, "inputs": ids,
+            "changedPropIds": [changed or inputs[0][0]],
+            "state": [{"id": i.split(".")[0], "property": i.split(".")[1], "value": v} for i, v in state]}
+
+
+def make_requests(wells, rng):
+    """Endless (name, payload) pairs, mixing the callbacks like a user session would."""
+    heatmap_pairs = ["MD|Rotary RPM", "MD|Weight on Bit", "Rotary RPM|Weight on Bit"]
+    while True:
+        well = rng.choice(wells)
+        yield "trace2d", callback_payload("2d_plot.figure", [("wellname2.value", well), ("2d_plot.relayoutData", None)])
+        x0 = rng.uniform(0, 5000)
+        yield "trace2d zoom", callback_payload("2d_plot.figure", [
+            ("wellname2.value", well), ("2d_plot.relayoutData", {"xaxis.range[0]": x0, "xaxis.range[1]": x0 + 500})],
+            changed="2d_plot.relayoutData")
+        yield "load_geometry", callback_payload("geometry_new.data", [
+            ("wellname.value", rng.sample(wells, min(2, len(wells)))), ("simplify_tol.value", 1)],
+            state=[("geometry_keys.data", {"tolerance": None, "wells": []})])
+        yield "fleet_heatmap", callback_payload("fleet_heatmap.figure", [
+            ("fleet_pair.value", rng.choice(heatmap_pairs)), ("fleet_vib.value", rng.choice(["ASHK2", "LSHK2"])),
+            ("fleet_stat.value", rng.choice(["mean", "p50", "p90", "p99", "count"]))])
+
+
+def post(url, payload):
+    request = Request(url + "/_dash-update-component", data=json.dumps(payload).encode(),
+                      headers={"Content-Type": "application/json"})
+    with urlopen(request, timeout=120) as response:
+        return len(response.read())
+
+
+def run_load(url, wells, duration, concurrency, seed=0):
+    latencies = {}
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.time() + duration
+
+    def client(k):
+        requests = make_requests(wells, random.Random(seed + k))
+        while time.time() < stop_at:
+            name, payload = next(requests)
+            t0 = time.perf_counter()
+            try:
+                post(url, payload)
+            except Exception as e:
+                with lock:
+                    errors.append("%s: %s" % (name, e))
+                continue
+            with lock:
+                latencies.setdefault(name, []).append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    return latencies, errors, elapsed
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def wait_ready(url, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urlopen(url + "/_dash-layout", timeout=5) as response:
+                return json.loads(response.read())
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError("server at %s did not come up" % url)
+
+
+def well_names(layout):
+    # the options of the 2D well dropdown, found anywhere in the layout tree
+    stack = [layout]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            props = node.get("props", {})
+            if props.get("id") == "wellname2":
+                return [o["value"] for o in props["options"]]
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    raise RuntimeError("no wellname2 dropdown in the layout")
+
+
+def report(label, latencies, errors, elapsed):
+    total = sum(len(v) for v in latencies.values())
+    print("== %s ==" % label)
+    print("requests %d in %.1f s, %.1f req/s, %d errors" % (total, elapsed, total / max(elapsed, 1e-9), len(errors)))
+    for name in sorted(latencies):
+        print("%-14s n=%-5d %s" % (name, len(latencies[name]), percentiles(latencies[name])))
+    for e in errors[:3]:
+        print("  error:", e)
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--url", default=None, help="test this server instead of starting one per worker count")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of load per worker count")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    args = parser.parse_args()
+
+    if args.url:
+        wells = well_names(wait_ready(args.url))
+        report(args.url, *run_load(args.url, wells, args.duration, args.concurrency))
+        return
+    summary = []
+    for workers in args.workers:
+        port = free_port()
+        url = "http://127.0.0.1:%d" % port
+        proc = subprocess.Popen([sys.executable, os.path.join(HERE, "serve.py"), "--workers", str(workers),
+                                 "--host", "127.0.0.1", "--port", str(port)], cwd=HERE)
+        try:
+            wells = well_names(wait_ready(url))
+            latencies, errors, elapsed = run_load(url, wells, args.duration, args.concurrency)
+        finally:
+            proc.terminate()
+            proc.wait()
+        report("%d worker(s)" % workers, latencies, errors, elapsed)
+        all_latencies = np.concatenate([v for v in latencies.values()]) if latencies else np.empty(0)
+        summary.append((workers, len(all_latencies) / max(elapsed, 1e-9), all_latencies))
+    print("== scaling ==")
+    for workers, rps, lat in summary:
+        print("workers %-3d %7.1f req/s   %s" % (workers, rps, percentiles(lat)))
+
+
+if __name__ == "__main__":
+    main()
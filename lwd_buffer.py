@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class LWDBuffer(object):
+    """Preallocated columnar sample buffer, one numpy array per channel.
+
+    Without a window the arrays grow by doubling, so appends are amortized
+    O(1) and the full run is kept. With a window the buffer becomes a ring of
+    the last `window` samples; every sample is written twice (at p and
+    p + window) so the valid range is always one contiguous slice and
+    `view` never copies.
+    """
+
+    def __init__(self, channels, capacity=4096, window=None, dtype=np.float64):
+        self.channels = list(channels)
+        self.window = window
+        self.dtype = dtype
+        if window is not None:
+            capacity = int(window)
+            size = 2 * capacity
+        else:
+            capacity = max(int(capacity), 1)
+            size = capacity
+        self.capacity = capacity
+        self._data = {ch: np.empty(size, dtype=dtype) for ch in self.channels}
+        self.total = 0  # samples ever appended
+
+    def __len__(self):
+        if self.window is None:
+            return self.total
+        return min(self.total, self.capacity)
+
+    @property
+    def nbytes(self):
+        return sum(data.nbytes for data in self._data.values())
+
+    @property
+    def start_index(self):
+        # absolute sample number of the oldest sample still held
+        return self.total - len(self)
+
+    def clear(self):
+        self.total = 0
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        for ch in self.channels:
+            data = np.empty(capacity, dtype=self.dtype)
+            data[:self.total] = self._data[ch][:self.total]
+            self._data[ch] = data
+        self.capacity = capacity
+
+    def append(self, samples):
+        """Append a batch given as {channel: array-like}; all channels same length."""
+        k = len(samples[self.channels[0]])
+        if k == 0:
+            return
+        if self.window is None:
+            if self.total + k > self.capacity:
+                self._grow(self.total + k)
+            for ch in self.channels:
+                self._data[ch][self.total:self.total + k] = samples[ch]
+        else:
+            w = self.capacity
+            skip = max(k - w, 0)  # older samples of the batch would be overwritten anyway
+            pos = (self.total + skip + np.arange(k - skip)) % w
+            for ch in self.channels:
+                values = np.asarray(samples[ch])[skip:]
+                data = self._data[ch]
+                data[pos] = values
+                data[pos + w] = values
+        self.total += k
+
+    def write(self, channel, start, values):
+        """Overwrite samples from absolute sample number `start`, e.g. late model output."""
+        values = np.asarray(values)
+        index = start + np.arange(len(values))
+        keep = index >= self.start_index  # samples already dropped from a window are ignored
+        index, values = index[keep], values[keep]
+        data = self._data[channel]
+        if self.window is None:
+            data[index] = values
+        else:
+            pos = index % self.capacity
+            data[pos] = values
+            data[pos + self.capacity] = values
+
+    def view(self, channel):
+        """Zero-copy view of the valid samples of `channel`, oldest first."""
+        data = self._data[channel]
+        if self.window is None:
+            return data[:self.total]
+        if self.total < self.capacity:
+            return data[:self.total]
+        start = self.total % self.capacity
+        return data[start:start + self.capacity]
+
+    def last(self, channel):
+        if self.total == 0:
+            return np.nan
+        return self.view(channel)[-1]
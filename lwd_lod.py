@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class _Level(object):
+    def __init__(self, capacity):
+        self.x = np.empty(capacity)
+        self.ymin = np.empty(capacity)
+        self.ymax = np.empty(capacity)
+        self.n = 0
+
+    def reserve(self, needed):
+        if needed <= len(self.x):
+            return
+        capacity = max(needed, 2 * len(self.x))
+        for name in ("x", "ymin", "ymax"):
+            data = np.empty(capacity)
+            data[:self.n] = getattr(self, name)[:self.n]
+            setattr(self, name, data)
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max envelope of one channel.
+
+    Level L holds one (x, min, max) bucket per `factor ** L` raw samples and is
+    updated incrementally: an appended batch only touches the buckets at the
+    tail of every level. The raw samples themselves (level 0) are not copied;
+    `select` takes them from the caller's sample buffer.
+    """
+
+    def __init__(self, factor=4):
+        self.factor = factor
+        self.levels = []
+        self.total = 0
+
+    def clear(self):
+        self.levels = []
+        self.total = 0
+
+    def append(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if len(y) == 0:
+            return
+        cx, cmin, cmax = x, y, y
+        c0 = self.total
+        self.total += len(y)
+        depth = 0
+        # keep adding coarser levels until a single bucket covers the run
+        while True:
+            if 0 < depth == len(self.levels):
+                # a new level is built from everything its child holds, not just this batch's tail
+                child = self.levels[depth - 1]
+                cx, cmin, cmax = child.x[:child.n], child.ymin[:child.n], child.ymax[:child.n]
+                c0 = 0
+            c1 = c0 + len(cmin)
+            parent = np.arange(c0, c1) // self.factor
+            starts = np.flatnonzero(np.r_[True, parent[1:] != parent[:-1]])
+            bx = cx[starts]
+            bmin = np.fmin.reduceat(cmin, starts)
+            bmax = np.fmax.reduceat(cmax, starts)
+            p0, p1 = parent[0], parent[-1] + 1
+            if depth == len(self.levels):
+                self.levels.append(_Level(max(p1, 64)))
+            level = self.levels[depth]
+            level.reserve(p1)
+            if level.n > p0:
+                # the first bucket was partially filled by the previous batch
+                bx[0] = level.x[p0]
+                bmin[0] = np.fmin(bmin[0], level.ymin[p0])
+                bmax[0] = np.fmax(bmax[0], level.ymax[p0])
+            level.x[p0:p1] = bx
+            level.ymin[p0:p1] = bmin
+            level.ymax[p0:p1] = bmax
+            level.n = p1
+            if p1 <= 1:
+                del self.levels[depth + 1:]
+                break
+            cx, cmin, cmax = level.x[p0:p1], level.ymin[p0:p1], level.ymax[p0:p1]
+            c0 = p0
+            depth += 1
+
+    def select(self, x0, x1, max_points, raw_x, raw_y):
+        """Return the (x, y) arrays to draw for the visible range [x0, x1].
+
+        The finest level with at most `max_points` visible points is used.
+        Raw samples come back as zero-copy slices of `raw_x`/`raw_y`; coarser
+        levels come back as interleaved min/max pairs.
+        """
+        if len(raw_x):
+            i0 = max(np.searchsorted(raw_x, x0, side="left") - 1, 0)
+            i1 = np.searchsorted(raw_x, x1, side="right") + 1
+            # the raw buffer may be a window that no longer covers x0
+            if i1 - i0 <= max_points and (raw_x[0] <= x0 or len(raw_x) == self.total):
+                return raw_x[i0:i1], raw_y[i0:i1]
+        for level in self.levels:
+            lx = level.x[:level.n]
+            i0 = max(np.searchsorted(lx, x0, side="left") - 1, 0)
+            i1 = np.searchsorted(lx, x1, side="right") + 1
+            if 2 * (i1 - i0) <= max_points or level is self.levels[-1]:
+                m = len(lx[i0:i1])
+                y = np.empty(2 * m)
+                y[0::2] = level.ymin[i0:i0 + m]
+                y[1::2] = level.ymax[i0:i0 + m]
+                return np.repeat(lx[i0:i1], 2), y
+        return raw_x, raw_y
@@ -0,0 +1,209 @@
+"""In-process timers, counters and gauges for vib_app and the Dash explorer.
+
+Collection is off unless VIB_METRICS=1 (or enable() is called); every hook
+then costs one flag check, so the instrumentation can stay in hot paths.
+
+    with metrics.timer("alarms"):
+        ...
+    @metrics.timed("trace2d")
+    def trace2d(...): ...
+    metrics.count("well_requests", well=name)
+    metrics.gauge("rss_bytes", rss_bytes)      # read when exported
+    print(metrics.render_text())
+"""
+import functools
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RECENT = 1024  # durations kept per timer for percentiles
+
+_enabled = os.environ.get("VIB_METRICS", "0") == "1"
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+_gauges = {}
+
+
+def enabled():
+    return _enabled
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = bool(flag)
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class _Timing(object):
+    __slots__ = ("count", "sum", "max", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=RECENT)
+
+
+def observe(name, seconds, **labels):
+    """Record one duration of timer `name`."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        t = _timers.get(key)
+        if t is None:
+            t = _timers[key] = _Timing()
+        t.count += 1
+        t.sum += seconds
+        t.max = max(t.max, seconds)
+        t.recent.append(seconds)
+
+
+class _Timer(object):
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """Context manager timing its block."""
+    return _Timer(name, labels) if _enabled else _NULL_TIMER
+
+
+def timed(name=None, **labels):
+    """Decorator timing every call of a function."""
+    def decorate(fn):
+        metric = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(metric, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+def gauge(name, value, **labels):
+    """Set a gauge; `value` may be a callable, which is read at export time."""
+    _gauges[_key(name, labels)] = value
+
+
+def timer_stats(name, **labels):
+    """count/sum/max and recent p50/p90/p99 of a timer in seconds, or None if it never ran."""
+    with _lock:
+        t = _timers.get(_key(name, labels))
+        if t is None or not t.count:
+            return None
+        recent = np.array(t.recent)
+        stats = {"count": t.count, "sum": t.sum, "max": t.max}
+    stats.update(zip(["p50", "p90", "p99"], np.percentile(recent, [50, 90, 99])))
+    return stats
+
+
+def counter_value(name, **labels):
+    return _counters.get(_key(name, labels), 0)
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS when psutil is missing), or None."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return None
+
+
+def _metric(name):
+    return "vib_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in items)
+
+
+def render_text():
+    """All metrics in the Prometheus text format."""
+    lines = []
+    with _lock:
+        timers = [(key, t.count, t.sum, t.max, np.array(t.recent)) for key, t in sorted(_timers.items())]
+        counters = sorted(_counters.items())
+    gauges = sorted(_gauges.items(), key=lambda item: item[0])
+    for (name, labels), n, total, peak, recent in timers:
+        m = _metric(name) + "_seconds"
+        for q, v in zip(["0.5", "0.9", "0.99"], np.percentile(recent, [50, 90, 99])):
+            lines.append("%s%s %.6g" % (m, _labels(labels, quantile=q), v))
+        lines.append("%s_count%s %d" % (m, _labels(labels), n))
+        lines.append("%s_sum%s %.6g" % (m, _labels(labels), total))
+        lines.append("%s_max%s %.6g" % (m, _labels(labels), peak))
+    for (name, labels), n in counters:
+        lines.append("%s_total%s %d" % (_metric(name), _labels(labels), n))
+    for (name, labels), value in gauges:
+        try:
+            value = value() if callable(value) else value
+        except Exception:
+            continue
+        if value is not None:
+            lines.append("%s%s %.6g" % (_metric(name), _labels(labels), value))
+    return "\n".join(lines) + "\n"
+
+
+gauge("process_rss_bytes", rss_bytes)
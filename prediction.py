@@ -0,0 +1,143 @@
+import importlib
+import multiprocessing as mp
+import queue
+import time
+import traceback
+
+import numpy as np
+
+FEATURE_CHANNELS = ["ROP", "WOB", "SRPM", "DRPM"]
+PRED_CHANNELS = ["pred_ASHK2", "pred_LSHK2"]
+
+
+class RollingFeatures(object):
+    """Rolling mean/std of the drilling channels, updated batch by batch.
+
+    Only the last `window - 1` samples are carried between batches, so a
+    batch costs O(batch + window) no matter how long the run is. The features
+    per sample are, for every channel: last value, rolling mean, rolling std.
+    """
+
+    def __init__(self, channels=FEATURE_CHANNELS, window=30):
+        self.channels = list(channels)
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._tail = {ch: np.empty(0) for ch in self.channels}
+
+    @property
+    def names(self):
+        return ["%s_%s" % (ch, f) for ch in self.channels for f in ("last", "mean", "std")]
+
+    def update(self, chunk):
+        n = len(chunk[self.channels[0]])
+        out = np.empty((n, 3 * len(self.channels)), dtype=np.float32)
+        for c, ch in enumerate(self.channels):
+            values = np.r_[self._tail[ch], np.nan_to_num(np.asarray(chunk[ch], dtype=float))]
+            s1 = np.r_[0.0, np.cumsum(values)]
+            s2 = np.r_[0.0, np.cumsum(values * values)]
+            end = np.arange(len(values) - n, len(values)) + 1
+            start = np.maximum(end - self.window, 0)
+            count = end - start
+            mean = (s1[end] - s1[start]) / count
+            var = np.maximum((s2[end] - s2[start]) / count - mean * mean, 0)
+            out[:, 3 * c] = values[-n:]
+            out[:, 3 * c + 1] = mean
+            out[:, 3 * c + 2] = np.sqrt(var)
+            self._tail[ch] = values[-(self.window - 1):] if self.window > 1 else values[:0]
+        return out
+
+
+def baseline_model(features):
+    """Placeholder model: flags shocks from WOB and DRPM variability.
+
+    Takes the (n, 12) RollingFeatures matrix, returns an (n, 2) array of
+    1.0 ("Top") / 0.0 for ASHK2 and LSHK2. Replace with a trained model via
+    the "module:function" spec.
+    """
+    wob_cv = features[:, 5] / np.maximum(features[:, 4], 1e-6)
+    drpm_cv = features[:, 11] / np.maximum(features[:, 10], 1e-6)
+    return np.c_[wob_cv > 0.3, drpm_cv > 0.3].astype(np.float32)
+
+
+def load_model(spec):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class ModelError(Exception):
+    pass
+
+
+def _serve(spec, requests, results):
+    # runs in the worker process; model import and inference stay off the GUI process.
+    # A failure is posted as a message before the None sentinel instead of dying silently
+    try:
+        model = load_model(spec)
+        while True:
+            item = requests.get()
+            if item is None:
+                break
+            seq, features = item
+            t0 = time.perf_counter()
+            preds = np.asarray(model(features), dtype=np.float32)
+            results.put((seq, preds, time.perf_counter() - t0))
+    except Exception as e:
+        traceback.print_exc()
+        results.put("%s: %s" % (type(e).__name__, e))
+    finally:
+        results.put(None)
+
+
+class PredictionStage(object):
+    """Scores feature batches with a pluggable model in a separate process.
+
+    `submit` returns immediately; `get` blocks for the next scored batch and
+    returns (seq, predictions, model seconds, round-trip seconds), or None
+    once the process has stopped. A failed or dead model process makes `get`
+    raise ModelError; `error` then holds the message and submits are dropped.
+    """
+
+    def __init__(self, model_spec="prediction:baseline_model"):
+        ctx = mp.get_context("spawn")
+        self._requests = ctx.Queue()
+        self._results = ctx.Queue()
+        self._sent = {}
+        self.error = None
+        self.process = ctx.Process(target=_serve, args=(model_spec, self._requests, self._results), daemon=True)
+        self.process.start()
+
+    def submit(self, seq, features):
+        if self.error is not None:
+            return
+        self._sent[seq] = time.perf_counter()
+        self._requests.put((seq, features))
+
+    def get(self, poll=0.5):
+        while True:
+            # checked before the wait, so results flushed by a process that just exited are still read
+            alive = self.process.is_alive()
+            try:
+                item = self._results.get(timeout=poll)
+                break
+            except queue.Empty:
+                if not alive:
+                    self.error = "model process exited with code %s" % self.process.exitcode
+                    raise ModelError(self.error)
+        if item is None:
+            return None
+        if isinstance(item, str):
+            self.error = item
+            raise ModelError(item)
+        seq, preds, model_time = item
+        return seq, preds, model_time, time.perf_counter() - self._sent.pop(seq, np.nan)
+
+    def close(self, timeout=2.0):
+        """Stop the model process, terminating it if it has not exited within `timeout` seconds."""
+        if self.process.is_alive():
+            self._requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
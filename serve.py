@@ -0,0 +1,79 @@
+"""Production serving of the Drilling Vibration Explorer (3D_plot.py).
+
+    gunicorn --preload --workers 4 --bind 0.0.0.0:8050 serve:server
+    python serve.py --workers 4 --port 8050          # the same, without the gunicorn script
+
+With --preload the app is imported once in the gunicorn master: the well
+stores are built (if stale) and paged in there, and the workers forked from
+it share the read-only memory maps instead of each unpickling the wells.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# cache memory maps rather than per-process copies; must be set before the app is imported
+os.environ.setdefault("VIB_WELL_MMAP", "1")
+
+explorer = importlib.import_module("3D_plot")
+app = explorer.app
+server = app.server
+
+
+def warmup(traces=False, tolerance=1.0, log=sys.stderr):
+    """Fault every well channel into the OS page cache and precompute the fleet stats.
+
+    With `traces`, the 3D traces of every well are built too; forked workers
+    inherit them copy-on-write.
+    """
+    start = time.time()
+    nbytes = 0
+    for name in explorer.wells.names():
+        store = explorer.wells.store(name)
+        nbytes += store.index().values.nbytes
+        for column in store.columns:
+            values = store.channel(column)
+            if not isinstance(values, pd.Categorical):
+                np.add.reduce(values, dtype=np.float64)  # touches every page
+                nbytes += values.nbytes
+    explorer.fleet.update()
+    if traces:
+        for name in explorer.wells.names():
+            explorer.well_traces(name, tolerance)
+    log.write("warmup: %d wells, %.1f MB paged in, %.1fs\n" % (
+        len(explorer.wells.names()), nbytes / 2.0 ** 20, time.time() - start))
+
+
+if os.environ.get("VIB_WARMUP", "1") == "1":
+    warmup(traces=os.environ.get("VIB_WARMUP_TRACES", "0") == "1")
+
+
+def main(argv=None):
+    from gunicorn.app.base import BaseApplication
+
+    parser = argparse.ArgumentParser(description="Serve the explorer with gunicorn worker processes")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--timeout", type=int, default=120, help="seconds before a stuck worker is restarted")
+    args = parser.parse_args(argv)
+
+    class Server(BaseApplication):
+        # this process is the gunicorn master; the app above was loaded and warmed before forking
+        def load_config(self):
+            for key, value in [("preload_app", True), ("workers", args.workers), ("timeout", args.timeout),
+                               ("bind", "%s:%d" % (args.host, args.port))]:
+                self.cfg.set(key, value)
+
+        def load(self):
+            return server
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_sources import SAMPLE_INTERVAL
+
+SPECTRAL_CHANNELS = ["ASHK2", "LSHK2"]
+## band edges as fractions of the Nyquist frequency, so they hold for any sample interval
+BANDS = OrderedDict([("low", (0.0, 0.2)), ("mid", (0.2, 0.5)), ("high", (0.5, 1.0))])
+
+
+def band_channel(channel, band):
+    return "%s_%s" % (channel, band)
+
+
+class StreamingSTFT(object):
+    """Short-time power spectra of one channel, computed frame by frame as samples arrive.
+
+    Only the last nfft - hop samples are kept between batches, so each sample
+    is transformed nfft / hop times in total and the history never again.
+    Every complete frame of a batch goes through one vectorized rfft.
+    """
+
+    def __init__(self, nfft=64, hop=16, sample_interval=SAMPLE_INTERVAL):
+        self.nfft = nfft
+        self.hop = hop
+        self.window = np.hanning(nfft)
+        # one-sided power spectral density, in units^2 / Hz
+        self.scale = 2.0 * sample_interval / (self.window ** 2).sum()
+        self.freqs = np.fft.rfftfreq(nfft, d=sample_interval)
+        self.reset()
+
+    def reset(self):
+        self._x = np.empty(0)
+        self._t = np.empty(0)
+
+    def update(self, t, values):
+        """Spectra of the frames completed by this batch: (frame end times, (n, nfft // 2 + 1) psd)."""
+        x = np.r_[self._x, np.asarray(values, dtype=float)]
+        t = np.r_[self._t, np.asarray(t, dtype=float)]
+        n = (len(x) - self.nfft) // self.hop + 1 if len(x) >= self.nfft else 0
+        if n == 0:
+            self._x, self._t = x, t
+            return np.empty(0), np.empty((0, len(self.freqs)))
+        frames = sliding_window_view(x, self.nfft)[::self.hop][:n]
+        with np.errstate(invalid="ignore"):
+            # gaps count as the frame mean rather than poisoning the whole frame
+            frames = np.nan_to_num(frames - np.nanmean(frames, axis=1, keepdims=True))
+        psd = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2 * self.scale
+        psd[:, 0] /= 2
+        if self.nfft % 2 == 0:
+            psd[:, -1] /= 2
+        ends = t[np.arange(n) * self.hop + self.nfft - 1]
+        self._x, self._t = x[n * self.hop:], t[n * self.hop:]
+        return ends, psd
+
+
+class SpectralStage(object):
+    """Rolling spectrograms and band-power channels of the shock channels.
+
+    update() turns a sample batch into a batch of band-power channels
+    ("ASHK2_high", ...) at the frame rate, which the alarm rules can
+    threshold like any other channel. The last `history` spectra of each
+    channel are kept for display and for Welch averages.
+    """
+
+    def __init__(self, channels=SPECTRAL_CHANNELS, nfft=64, hop=16, bands=BANDS, history=256,
+                 sample_interval=SAMPLE_INTERVAL):
+        self.channels = list(channels)
+        self.history = history
+        self.frame_step = hop * sample_interval
+        self.stft = {ch: StreamingSTFT(nfft, hop, sample_interval) for ch in self.channels}
+        self.freqs = self.stft[self.channels[0]].freqs
+        df = self.freqs[1] - self.freqs[0]
+        rel = self.freqs / self.freqs[-1]
+        # each bin belongs to exactly one band; the upper edge of the last band is inclusive
+        self.bands = OrderedDict((band, ((rel >= lo) & ((rel < hi) | (hi >= 1.0))) * df)
+                                 for band, (lo, hi) in bands.items())
+        self.band_channels = [band_channel(ch, band) for ch in self.channels for band in self.bands]
+        self.reset()
+
+    def reset(self):
+        for stft in self.stft.values():
+            stft.reset()
+        self.times = np.empty(0)
+        self.spectrogram = {ch: np.empty((0, len(self.freqs))) for ch in self.channels}
+
+    def update(self, chunk):
+        out = {}
+        for ch in self.channels:
+            ends, psd = self.stft[ch].update(chunk["Time"], chunk[ch])
+            out["Time"] = ends
+            for band, weights in self.bands.items():
+                out[band_channel(ch, band)] = psd @ weights
+            self.spectrogram[ch] = np.r_[self.spectrogram[ch], psd][-self.history:]
+        self.times = np.r_[self.times, out["Time"]][-self.history:]
+        return out
+
+    def welch(self, channel, frames=16):
+        """Welch estimate of the PSD: the mean of the last `frames` spectra."""
+        return self.spectrogram[channel][-frames:].mean(axis=0)
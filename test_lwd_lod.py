@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from lwd_lod import MinMaxPyramid
+
+
+def check_levels(pyramid, x, y):
+    # every bucket of level L against a brute-force min/max of its factor ** (L + 1) raw samples
+    assert pyramid.levels
+    for depth, level in enumerate(pyramid.levels):
+        size = pyramid.factor ** (depth + 1)
+        starts = np.arange(0, len(y), size)
+        assert level.n == len(starts)
+        np.testing.assert_array_equal(level.x[:level.n], x[starts])
+        np.testing.assert_array_equal(level.ymin[:level.n], np.minimum.reduceat(y, starts))
+        np.testing.assert_array_equal(level.ymax[:level.n], np.maximum.reduceat(y, starts))
+    assert pyramid.levels[-1].n == 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_batches_match_brute_force(seed):
+    rng = np.random.RandomState(seed)
+    n = 20000
+    x = np.arange(n) * 10.0
+    y = rng.normal(size=n)
+    # size-1 appends first, as at 1x playback, then random batch sizes
+    cuts = np.r_[np.arange(1, 300), np.sort(rng.choice(np.arange(300, n), 60, replace=False))]
+    pyramid = MinMaxPyramid()
+    for a, b in zip(np.r_[0, cuts], np.r_[cuts, n]):
+        pyramid.append(x[a:b], y[a:b])
+    check_levels(pyramid, x, y)
+
+
+def test_single_sample_appends_keep_early_samples():
+    n = 5000
+    x = np.arange(n) * 10.0
+    y = np.zeros(n)
+    y[100] = 50.0
+    pyramid = MinMaxPyramid()
+    for i in range(n):
+        pyramid.append(x[i:i + 1], y[i:i + 1])
+    check_levels(pyramid, x, y)
+    assert all(level.ymax[:level.n].max() == 50.0 for level in pyramid.levels)
+    assert all(level.x[0] == 0.0 for level in pyramid.levels)
@@ -1,20 +1,35 @@
 ## Author: Yinsen Miao
 
-import pandas as pd
 import numpy as np
-import sys, ctypes, os
+import sys, ctypes, os, argparse, time
+from collections import OrderedDict, deque
 import seaborn as sns
 import datetime
 from PyQt5.QtWidgets import (QVBoxLayout, QWidget, QMainWindow, QFileDialog, QApplication, QAction,
-                             QDesktopWidget, QToolTip, QSplitter, QMessageBox)
+                             QDesktopWidget, QToolTip, QSplitter, QMessageBox, QLabel)
 from PyQt5 import QtCore, QtGui
 from PyQt5.QtGui import QFont, QIcon
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QThread, QObject, pyqtSignal
 
 import pyqtgraph as pg
 from pyqtgraph.parametertree import Parameter, ParameterTree
 from pyqtgraph.parametertree import types as pTypes
 
+from lwd_buffer import LWDBuffer
+from lwd_lod import MinMaxPyramid
+from data_sources import make_source, concat_chunks
+from alarms import AlarmEngine, load_rules
+from prediction import RollingFeatures, PredictionStage, ModelError, PRED_CHANNELS
+from spectral import SpectralStage, SPECTRAL_CHANNELS
+from indicators import DrillingIndicators, INDICATORS
+import metrics
+
+LWD_CHANNELS = ["Time", "ROP", "WOB", "SRPM", "DRPM", "ASHK2", "LSHK2", "pred_ASHK2", "pred_LSHK2"]
+PLOT_CHANNELS = ["ROP", "WOB", "SRPM", "DRPM", "ASHK2", "LSHK2"]
+ALARM_RULES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alarm_rules.json")
+MAX_FPS = 30
+PLAYBACK_SPEEDS = OrderedDict([("%dx" % s, s) for s in [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]])
+
 
 class GUIWidget(QWidget):
     def __init__(self):
@@ -42,6 +57,12 @@ class GUIWidget(QWidget):
         self.splitter.addWidget(self.wit_lwd_log)
         self.splitter.setSizes([int(self.width() * 0.2), int(self.width() * 0.8)])
 
+        # FPS / latency / buffer overlay in the top right corner of the plots, see View > Show Stats
+        self.stats_overlay = QLabel(self.wit_lwd_log)
+        self.stats_overlay.setStyleSheet("background: rgba(255, 255, 255, 210); color: black; padding: 4px;"
+                                         "font-family: monospace;")
+        self.stats_overlay.hide()
+
         # add plots
         self.plt_rop = self.wit_lwd_log.addPlot()
         self.wit_lwd_log.nextRow()
@@ -54,6 +75,15 @@ class GUIWidget(QWidget):
         self.plt_ashk = self.wit_lwd_log.addPlot()
         self.wit_lwd_log.nextRow()
         self.plt_lshk = self.wit_lwd_log.addPlot()
+        self.wit_lwd_log.nextRow()
+        self.plt_spec = self.wit_lwd_log.addPlot()
+
+        # rolling spectrogram of one shock channel, frequency on the y axis
+        self.img_spec = pg.ImageItem()
+        self.img_spec.setLookupTable(pg.colormap.get("viridis").getLookupTable())
+        self.plt_spec.addItem(self.img_spec)
+        self.plt_spec.disableAutoRange()
+        self.plt_spec.setMouseEnabled(y=False)
 
         # add grids
         self.plt_rop.showGrid(x=True, y=True, alpha=0.3)
@@ -69,6 +99,7 @@ class GUIWidget(QWidget):
         self.plt_drpm.setXLink(self.plt_rop)
         self.plt_ashk.setXLink(self.plt_rop)
         self.plt_lshk.setXLink(self.plt_rop)
+        self.plt_spec.setXLink(self.plt_rop)
 
         # add y-label
         self.plt_rop.setLabel("left", '<font size="5", face="Helvetica">ROP (ft/h)</font>')
@@ -77,12 +108,77 @@ class GUIWidget(QWidget):
         self.plt_drpm.setLabel("left", '<font size="5", face="Helvetica">DRPM (rpm)</font>')
         self.plt_ashk.setLabel("left", '<font size="5", face="Helvetica">ASHK (G)</font>')
         self.plt_lshk.setLabel("left", '<font size="5", face="Helvetica">LSHK (G)</font>')
-        self.plt_lshk.setLabel("bottom", '<font size="6", face="Helvetica">Time (s)</font>')
+        self.plt_spec.setLabel("left", '<font size="5", face="Helvetica">Freq (Hz)</font>')
+        self.plt_spec.setLabel("bottom", '<font size="6", face="Helvetica">Time (s)</font>')
+
+
+class IngestWorker(QObject):
+    # reads a DataSource on a worker thread; the GUI thread drains `pending` once per frame
+    sig_finished = pyqtSignal()
+
+    def __init__(self, source):
+        super(IngestWorker, self).__init__()
+        self.source = source
+        self.pending = deque()
+
+    def run(self):
+        try:
+            for chunk in self.source.chunks():
+                self.pending.append(chunk)
+        finally:
+            self.sig_finished.emit()
+
+    def drain(self):
+        chunks = []
+        while self.pending:
+            chunks.append(self.pending.popleft())
+        return chunks
+
+    def stop(self):
+        self.source.stop()
+
+
+class PredictionWorker(QObject):
+    # waits for scored batches from the model process and hands them to the GUI thread
+    sig_result = pyqtSignal(object)
+    sig_error = pyqtSignal(str)
+
+    def __init__(self, stage):
+        super(PredictionWorker, self).__init__()
+        self.stage = stage
+
+    def run(self):
+        try:
+            while True:
+                result = self.stage.get()
+                if result is None:
+                    break
+                self.sig_result.emit(result)
+        except ModelError as e:
+            self.sig_error.emit(str(e))
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, source_spec="demo_data.csv", model_spec=None, max_fps=MAX_FPS):
         super(MainWindow, self).__init__()
+        self.source_spec = source_spec
+        self.model_spec = model_spec
+        self.ingest_thread = None
+        # ingest and rendering are decoupled: each frame drains every pending batch, then redraws once
+        self.frame_interval = 1.0 / max_fps
+        self.render_timer = QTimer()
+        self.render_timer.setInterval(int(1000 * self.frame_interval))
+        self.render_timer.timeout.connect(self.render_frame)
+        self.frames_skipped = 0
+        self._skip = 0
+        self._frame_start = None
+        self._dirty = False
+        self._alarm_changes = OrderedDict()
+        self.stats_timer = QTimer()
+        self.stats_timer.setInterval(1000)
+        self.stats_timer.timeout.connect(self.update_stats_overlay)
+        self._metrics_were_enabled = metrics.enabled()
+        self.run_id = 0
         self.my_app_id = "Shell AI Vibration"
         # ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(self.my_app_id)
         self.gui_widget = GUIWidget()
@@ -106,6 +202,7 @@ class MainWindow(QMainWindow):
         self.about_act = QAction("&About", self, shortcut="Ctrl+A", triggered=self.about)
         self.about_qt_act = QAction("About &Qt", self, triggered=QApplication.instance().aboutQt)
         self.save_screen_shot_act = QAction("Save &Screen Shot", self, shortcut="F10", triggered=self.save_screen_shot)
+        self.stats_act = QAction("Show &Stats", self, shortcut="F9", checkable=True, triggered=self.toggle_stats)
 
     def create_menu(self):
         # save: save_screen_shot, save_interpretation
@@ -115,6 +212,7 @@ class MainWindow(QMainWindow):
         # full screen
         self.view_menu = self.menuBar().addMenu("&View")
         self.view_menu.addAction(self.full_screen_act)
+        self.view_menu.addAction(self.stats_act)
 
         # help menu
         self.help_menu = self.menuBar().addMenu("&Help")
@@ -126,7 +224,9 @@ class MainWindow(QMainWindow):
         self.params = Parameter.create(name="Control Panel", type="group", children=[
             {"name": "Well Name: ", "type": "str", "value": "MONROE STATE 1-4 WRD 2H", "tip": "well name"},
             {"name": "Bit Run:", "type": "str", "value": "5"},
+            {"name": "Model Latency: ", "type": "str", "value": "-", "readonly": True, "tip": "prediction round trip per batch"},
             {"name": "Start", "type": "action", "tip": "Start Analysis", "value": "Stream"},
+            {"name": "Playback Speed", "type": "list", "values": PLAYBACK_SPEEDS, "value": 1, "tip": "replay speed of a recorded log"},
             {"name": "BHA Configuration", "type": "group", "children":[
                 {"name": "Hole Size: ", "type": "str", "value": "6.125 (in)", 'readonly': True},
                 {"name": "Stabilizer: ", "type": "str", "value": "No", 'readonly': True},
@@ -137,15 +237,25 @@ class MainWindow(QMainWindow):
             {"name": "ASHK", "type": "group", "children":[
                 {"name": "Actual", "type": "color", "value": "FF0", "tip": "ASHK Actual", "readonly": False},
                 {"name": "Prediction", "type": "color", "value": "FF0", "tip": "ASHK Prediction", "readonly": False},
+                {"name": "Band Power", "type": "color", "value": "FF0", "tip": "ASHK high-band power", "readonly": False},
             ]},
             {"name": "LSHK", "type": "group", "children": [
                 {"name": "Actual", "type": "color", "value": "FF0", "tip": "LSHK Actual", "readonly": False},
                 {"name": "Prediction", "type": "color", "value": "FF0", "tip": "LSHK Prediction", "readonly": False},
+                {"name": "Band Power", "type": "color", "value": "FF0", "tip": "LSHK high-band power", "readonly": False},
+            ]},
+            {"name": "Spectrogram", "type": "list", "values": SPECTRAL_CHANNELS, "value": SPECTRAL_CHANNELS[0]},
+            {"name": "Indicators", "type": "group", "children": [
+                {"name": ch, "title": label, "type": "bool", "value": False} for ch, label in INDICATORS.items()
             ]},
 
         ])
         self.gui_widget.tree.setParameters(self.params, showTop=True)
         self.params.param("Start").sigActivated.connect(self.start_act)
+        self.params.param("Spectrogram").sigValueChanged.connect(self.update_spectrogram)
+        self.params.param("Playback Speed").sigValueChanged.connect(self.set_playback_speed)
+        for child in self.params.param("Indicators").children():
+            child.sigValueChanged.connect(self.toggle_indicator)
 
     def center(self):
         qr = self.frameGeometry()
@@ -176,19 +286,35 @@ class MainWindow(QMainWindow):
             self.showFullScreen()
             self.full_screen_act.setText("Exit &Full Screen")
 
+    @metrics.timed("load")
     def load_data(self):
         self.well_name = "Example Well"
-        # load time base data
-        self.full_lwd_df = pd.read_csv("demo_data.csv")
-        self.n, _ = self.full_lwd_df.shape
-        self.full_lwd_df["Time"] = np.arange(0, self.n) * 10
-        self.gui_widget.plt_rop.setXRange(0, 10 * self.n, padding=0)
-        self.gui_widget.plt_rop.setYRange(0, self.full_lwd_df["ROP"].max() + 5, padding=0)
-        self.gui_widget.plt_wob.setYRange(0, self.full_lwd_df["WOB"].max() + 5, padding=0)
-        self.gui_widget.plt_srpm.setYRange(self.full_lwd_df["SRPM"].min() - 5, self.full_lwd_df["SRPM"].max() + 5, padding=0)
-        self.gui_widget.plt_drpm.setYRange(self.full_lwd_df["DRPM"].min() - 5, self.full_lwd_df["DRPM"].max() + 5, padding=0)
-        self.gui_widget.plt_ashk.setYRange(0, self.full_lwd_df["ASHK2"].max() + 5, padding=0)
-        self.gui_widget.plt_lshk.setYRange(0, self.full_lwd_df["LSHK2"].max() + 5, padding=0)
+        # samples arrive from the ingest worker, so ranges follow the data
+        self.lwd_buffer = LWDBuffer(LWD_CHANNELS + list(INDICATORS))
+        self.indicators = DrillingIndicators()
+        metrics.gauge("buffer_samples", lambda: len(self.lwd_buffer))
+        metrics.gauge("buffer_bytes", lambda: self.lwd_buffer.nbytes)
+        # the GUI only shows the alarm state, so no event history is kept for long runs
+        self.alarm_engine = AlarmEngine(load_rules(ALARM_RULES), max_events=0)
+        self.spectral_stage = SpectralStage()
+        self.gui_widget.plt_spec.setYRange(0, self.spectral_stage.freqs[-1], padding=0)
+        self.prediction_stage = None
+        if self.model_spec:
+            # live scoring replaces the precomputed pred_* columns of the source
+            self.rolling_features = RollingFeatures()
+            self.prediction_stage = PredictionStage(self.model_spec)
+            self.prediction_times = {}
+            self.prediction_worker = PredictionWorker(self.prediction_stage)
+            self.prediction_thread = QThread()
+            self.prediction_worker.moveToThread(self.prediction_thread)
+            self.prediction_thread.started.connect(self.prediction_worker.run)
+            self.prediction_worker.sig_result.connect(self.update_prediction)
+            self.prediction_worker.sig_error.connect(self.prediction_failed)
+            self.prediction_thread.start()
+        self.gui_widget.plt_rop.enableAutoRange(axis="x")
+        for plt in [self.gui_widget.plt_rop, self.gui_widget.plt_wob, self.gui_widget.plt_srpm,
+                    self.gui_widget.plt_drpm, self.gui_widget.plt_ashk, self.gui_widget.plt_lshk]:
+            plt.enableAutoRange(axis="y")
 
     def plot_data(self):
         self.plt_rop_data  = self.gui_widget.plt_rop.plot(pxMode=True, pen=pg.mkPen(color=(0, 48, 143, 255), width=3))
@@ -206,58 +332,266 @@ class MainWindow(QMainWindow):
                                label='LSHK2={value:0.3f}g', pos=5.19,
                                labelOpts={'color': (200, 0, 0, 0), 'movable': True, 'fill': (0, 0, 200, 0), "position": 0.9})
         self.gui_widget.plt_lshk.addItem(lshk_inf)
-    def update_plt_data(self):
-        # self.lwd_df = self.full_lwd_df[:self.n]
-        # set_data
-        self.plt_rop_data.setData(y=list(self.lwd_df["ROP"]), x=list(self.lwd_df["Time"]))
-        self.plt_wob_data.setData(y=list(self.lwd_df["WOB"]), x=list(self.lwd_df["Time"]))
-        self.plt_srpm_data.setData(y=list(self.lwd_df["SRPM"]), x=list(self.lwd_df["Time"]))
-        self.plt_drpm_data.setData(y=list(self.lwd_df["DRPM"]), x=list(self.lwd_df["Time"]))
-        self.plt_ashk_data.setData(y=list(self.lwd_df["ASHK2"]), x=list(self.lwd_df["Time"]))
-        self.plt_lshk_data.setData(y=list(self.lwd_df["LSHK2"]), x=list(self.lwd_df["Time"]))
-
-
-        if self.lwd_df["pred_ASHK2"].values[-1] == "Top":
-            self.params.param("ASHK").param("Prediction").setValue("FF0000")
-        else:
-            self.params.param("ASHK").param("Prediction").setValue("008000")
 
-        if self.lwd_df["ASHK2"].values[-1] > 11.1856:
-            self.params.param("ASHK").param("Actual").setValue("FF0000")
+        # plot, curve, channel; each channel also gets a min/max level-of-detail pyramid
+        self.lwd_tracks = [(self.gui_widget.plt_rop, self.plt_rop_data, "ROP"),
+                           (self.gui_widget.plt_wob, self.plt_wob_data, "WOB"),
+                           (self.gui_widget.plt_srpm, self.plt_srpm_data, "SRPM"),
+                           (self.gui_widget.plt_drpm, self.plt_drpm_data, "DRPM"),
+                           (self.gui_widget.plt_ashk, self.plt_ashk_data, "ASHK2"),
+                           (self.gui_widget.plt_lshk, self.plt_lshk_data, "LSHK2")]
+        self.lwd_lod = {ch: MinMaxPyramid() for ch in PLOT_CHANNELS}
+        # x axes are linked, so one signal covers panning/zooming of every track
+        self.gui_widget.plt_rop.sigXRangeChanged.connect(self.update_curves)
+        self.indicator_plots = {}
+        self.indicator_row = self.gui_widget.wit_lwd_log.ci.layout.rowCount()
+
+    def toggle_indicator(self, param, show):
+        # indicator plots go below the fixed tracks, in INDICATORS order
+        ch = param.name()
+        layout = self.gui_widget.wit_lwd_log
+        if show and ch not in self.indicator_plots:
+            plt = pg.PlotItem()
+            plt.showGrid(x=True, y=True, alpha=0.3)
+            plt.setXLink(self.gui_widget.plt_rop)
+            plt.setLabel("left", '<font size="5", face="Helvetica">%s</font>' % INDICATORS[ch])
+            plt.enableAutoRange(axis="y")
+            color = pg.intColor(list(INDICATORS).index(ch), hues=len(INDICATORS))
+            curve = plt.plot(pxMode=True, pen=pg.mkPen(color=color, width=3))
+            # the pyramid catches up on the history once, then grows with the stream
+            self.lwd_lod[ch] = MinMaxPyramid()
+            self.lwd_lod[ch].append(self.lwd_buffer.view("Time"), self.lwd_buffer.view(ch))
+            self.lwd_tracks.append((plt, curve, ch))
+            self.indicator_plots[ch] = plt
+        elif not show and ch in self.indicator_plots:
+            layout.removeItem(self.indicator_plots.pop(ch))
+            self.lwd_tracks = [track for track in self.lwd_tracks if track[2] != ch]
+            del self.lwd_lod[ch]
+        for plt in self.indicator_plots.values():
+            if plt.scene() is not None:
+                layout.removeItem(plt)
+        for row, ch in enumerate([ch for ch in INDICATORS if ch in self.indicator_plots]):
+            layout.addItem(self.indicator_plots[ch], row=self.indicator_row + row, col=0)
+        self.update_curves()
+
+    def update_curves(self):
+        # draw only as many points as the plot has pixels, picking the pyramid level per plot
+        time = self.lwd_buffer.view("Time")
+        vb = self.gui_widget.plt_rop.getViewBox()  # the other tracks are x-linked to it
+        x0, x1 = vb.viewRange()[0]
+        if vb.autoRangeEnabled()[0] and len(time):
+            # auto-range follows the data we hand it, so give it the full extent
+            x0, x1 = time[0], time[-1]
+        for plt, curve, ch in self.lwd_tracks:
+            max_points = 2 * int(plt.getViewBox().width()) or 2000
+            x, y = self.lwd_lod[ch].select(x0, x1, max_points, time, self.lwd_buffer.view(ch))
+            curve.setData(x=x, y=y)
+
+    def update_spectrogram(self, *args):
+        times = self.spectral_stage.times
+        if len(times) == 0:
+            self.gui_widget.img_spec.clear()
+            return
+        spec = self.spectral_stage.spectrogram[self.params.param("Spectrogram").value()]
+        self.gui_widget.img_spec.setImage(np.log10(spec + 1e-6), autoLevels=True)
+        # frame i covers the hop ending at times[i]; rows are frequency bins
+        step = self.spectral_stage.frame_step
+        fmax = self.spectral_stage.freqs[-1]
+        self.gui_widget.img_spec.setRect(QtCore.QRectF(times[0] - step, 0, times[-1] - times[0] + step, fmax))
+
+    def update_plt_data(self, alarm_changes=()):
+        self.update_curves()
+        self.update_spectrogram()
+        self.update_alarm_params(alarm_changes)
+
+    @metrics.timed("render")
+    def redraw(self):
+        self.update_plt_data(list(self._alarm_changes.values()))
+        self._alarm_changes.clear()
+        self._dirty = False
+        metrics.count("frames")
+
+    def ingest_pending(self):
+        if self.ingest_thread is None:
+            return
+        chunks = self.ingest_worker.drain()
+        if chunks:
+            self.update(concat_chunks(chunks))
+
+    def render_frame(self):
+        now = time.perf_counter()
+        self.ingest_pending()
+        if self._frame_start is not None:
+            # the last frame's cost includes the repaint Qt did after redraw() returned
+            self._skip = max(int((now - self._frame_start) / self.frame_interval) - 1, 0)
+            self._frame_start = None
+        if self._skip:
+            # rendering fell behind, let this frame pass; samples were still ingested
+            self._skip -= 1
+            self.frames_skipped += 1
+            metrics.count("frames_skipped")
+            return
+        if not self._dirty:
+            return
+        self._frame_start = now
+        self.redraw()
+
+    def set_playback_speed(self, param=None, speed=None):
+        # only a replayed log has a speed; live sources arrive as fast as they arrive
+        if self.ingest_thread is not None and hasattr(self.ingest_worker.source, "speed"):
+            self.ingest_worker.source.speed = self.params.param("Playback Speed").value()
+
+    def update_alarm_params(self, alarm_changes):
+        # only rules whose state flipped touch the parameter tree
+        for rule in alarm_changes:
+            if rule.param is None:
+                continue
+            group, child = rule.param.split("/")
+            color = "FF0000" if self.alarm_engine.state[rule.name] else "008000"
+            self.params.param(group).param(child).setValue(color)
+
+    @metrics.timed("ingest")
+    def update(self, chunk):
+        # append the whole batch in O(batch) instead of re-slicing the whole log
+        n = len(chunk["Time"])
+        if self.prediction_stage is not None:
+            with metrics.timer("features"):
+                chunk = {ch: values for ch, values in chunk.items() if ch not in PRED_CHANNELS}
+                if self.prediction_stage.error is None:
+                    seq = (self.run_id, self.lwd_buffer.total)
+                    self.prediction_times[seq] = chunk["Time"]
+                    self.prediction_stage.submit(seq, self.rolling_features.update(chunk))
+        samples = {ch: chunk[ch] if ch in chunk else np.full(n, np.nan) for ch in LWD_CHANNELS}
+        with metrics.timer("indicators"):
+            samples.update(self.indicators.update(samples))
+        self.lwd_buffer.append(samples)
+        for ch, pyramid in self.lwd_lod.items():
+            pyramid.append(samples["Time"], samples[ch])
+        self.ptr += len(samples["Time"])
+        with metrics.timer("spectral"):
+            bands = self.spectral_stage.update(samples)
+        with metrics.timer("alarms"):
+            alarm_changes = self.alarm_engine.process(chunk)
+            # band powers arrive at the frame rate, as a batch of their own
+            alarm_changes += self.alarm_engine.process(bands)
+        self.mark_alarm_changes(alarm_changes)
+        self._dirty = True
+        metrics.count("samples", n)
+
+    def mark_alarm_changes(self, alarm_changes):
+        # the parameter tree is refreshed with the next frame
+        for rule in alarm_changes:
+            self._alarm_changes[rule.name] = rule
+
+    def update_prediction(self, result):
+        seq, preds, model_time, latency = result
+        times = self.prediction_times.pop(seq, None)
+        if seq[0] != self.run_id or times is None:
+            return  # scored batch from a previous run
+        # write predictions back into the stream and let the alarm rules see them
+        batch = {"Time": times}
+        for i, ch in enumerate(PRED_CHANNELS):
+            self.lwd_buffer.write(ch, seq[1], preds[:, i])
+            batch[ch] = preds[:, i]
+        self.mark_alarm_changes(self.alarm_engine.process(batch))
+        if not self.render_timer.isActive():
+            self.redraw()  # scored after the stream ended, no frame will pick it up
+        self.params.param("Model Latency: ").setValue("%.1f ms (model %.1f ms)" % (1000 * latency, 1000 * model_time))
+
+    def prediction_failed(self, message):
+        # the stream goes on without predictions
+        self.prediction_times = {}
+        self.params.param("Model Latency: ").setValue("failed: %s" % message)
+
+    def toggle_stats(self, show):
+        # metrics are collected while the overlay is shown, or all along with VIB_METRICS=1
+        if show:
+            self._metrics_were_enabled = metrics.enabled()
+            metrics.enable(True)
+            self._stats_last = (time.perf_counter(), metrics.counter_value("frames"))
+            self.stats_timer.start()
+            self.update_stats_overlay()
         else:
-            self.params.param("ASHK").param("Actual").setValue("008000")
-
-
-        if self.lwd_df["pred_LSHK2"].values[-1] == "Top":
-            self.params.param("LSHK").param("Prediction").setValue("FF0000")
-        else:
-            self.params.param("LSHK").param("Prediction").setValue("008000")
-
-        if self.lwd_df["LSHK2"].values[-1] > 5.19:
-            self.params.param("LSHK").param("Actual").setValue("FF0000")
-        else:
-            self.params.param("LSHK").param("Actual").setValue("008000")
-
-
-    def update(self):
-        self.ptr += 1
-        self.lwd_df = self.full_lwd_df[:self.ptr]
-        self.update_plt_data()
-        if self.ptr > self.n:
-            self.timer.stop()
-            self.ptr = 0
-            self.params.param("Start").show(True)
+            self.stats_timer.stop()
+            metrics.enable(self._metrics_were_enabled)
+        self.gui_widget.stats_overlay.setVisible(show)
+
+    def update_stats_overlay(self):
+        now, frames = time.perf_counter(), metrics.counter_value("frames")
+        last_time, last_frames = self._stats_last
+        self._stats_last = (now, frames)
+        lines = ["FPS    %5.1f  (%d skipped)" % ((frames - last_frames) / max(now - last_time, 1e-9), self.frames_skipped)]
+        for label, name in [("tick", "ingest"), ("render", "render")]:
+            stats = metrics.timer_stats(name)
+            lines.append("%-6s %s" % (label, "p50 %.1f  p99 %.1f ms" % (1000 * stats["p50"], 1000 * stats["p99"])
+                                      if stats else "-"))
+        lines.append("buffer %d samples, %.1f MB" % (len(self.lwd_buffer), self.lwd_buffer.nbytes / 2.0 ** 20))
+        overlay = self.gui_widget.stats_overlay
+        overlay.setText("\n".join(lines))
+        overlay.adjustSize()
+        overlay.move(self.gui_widget.wit_lwd_log.width() - overlay.width() - 10, 10)
+        overlay.raise_()
+
+    def stream_finished(self):
+        self.render_timer.stop()
+        self.ingest_pending()
+        if self._dirty:
+            self.redraw()
+        self.ingest_thread.quit()
+        self.ingest_thread.wait()
+        self.ingest_thread = None
+        self.ptr = 0
+        self.params.param("Start").show(True)
 
     def start_act(self):
         self.params.param("Start").show(False)
-        self.timer = pg.QtCore.QTimer()
-        self.timer.timeout.connect(self.update)
-        self.timer.start(200)
+        self.lwd_buffer.clear()
+        for pyramid in self.lwd_lod.values():
+            pyramid.clear()
+        self.alarm_engine.reset()
+        self.spectral_stage.reset()
+        self.indicators.reset()
+        self._alarm_changes.clear()
+        self.run_id += 1
+        if self.prediction_stage is not None:
+            self.rolling_features.reset()
+            self.prediction_times = {}
+        self.ingest_worker = IngestWorker(make_source(self.source_spec))
+        self.ingest_thread = QThread()
+        self.ingest_worker.moveToThread(self.ingest_thread)
+        self.ingest_thread.started.connect(self.ingest_worker.run)
+        self.ingest_worker.sig_finished.connect(self.stream_finished)
+        self.set_playback_speed()
+        self.ingest_thread.start()
+        self._skip = 0
+        self._frame_start = None
+        self.frames_skipped = 0
+        self.render_timer.start()
+
+    def closeEvent(self, event):
+        self.render_timer.stop()
+        if self.ingest_thread is not None:
+            self.ingest_worker.stop()
+            self.ingest_thread.quit()
+            self.ingest_thread.wait()
+        if self.prediction_stage is not None:
+            self.prediction_stage.close()  # terminates a hung model process
+            self.prediction_thread.quit()
+            self.prediction_thread.wait(5000)
+        super(MainWindow, self).closeEvent(event)
 
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    win = MainWindow()
+    parser = argparse.ArgumentParser(description="Vibration Analysis")
+    parser.add_argument("source", nargs="?", default="demo_data.csv",
+                        help='CSV to replay, "tail:<csv>" or "tcp:<host>:<port>"')
+    parser.add_argument("--model", default=None,
+                        help='score pred_ASHK2/pred_LSHK2 live with a "module:function" model, '
+                             'e.g. prediction:baseline_model')
+    parser.add_argument("--fps", type=float, default=MAX_FPS, help="maximum redraws per second")
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    win = MainWindow(args.source, args.model, args.fps)
     win.show()
     win.resize(1100, 800)
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from channel_store import ChannelStore, build_well_stores
+
+
+def _nbytes(value):
+    if isinstance(value, pd.Categorical):
+        return value.codes.nbytes + 64 * len(value.categories)
+    return getattr(value, "nbytes", 0)
+
+
+class BoundedCache(object):
+    """LRU mapping that evicts the least recently used entries beyond `max_bytes`.
+
+    Safe to share between the request threads of the Dash server.
+    """
+
+    def __init__(self, max_bytes, sizeof=_nbytes):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self._data.pop(key)[1]
+            self._data[key] = (value, size)
+            self.nbytes += size
+            # the newest entry is kept even when it alone exceeds the budget
+            while self.nbytes > self.max_bytes and len(self._data) > 1:
+                _, (_, old_size) = self._data.popitem(last=False)
+                self.nbytes -= old_size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class WellCatalog(object):
+    """Well names and metadata up front; channel data loaded per well on demand.
+
+    Only wells.json is read at startup. Channels are read from the well's
+    memory-mapped store the first time they are asked for and kept in a
+    BoundedCache, so memory follows the wells users actually look at.
+    With copy=False the cache holds the read-only memory maps themselves,
+    so processes forked from one catalog share the pages of the OS cache.
+    """
+
+    def __init__(self, pickle_path, store_path=None, max_bytes=512 * 2 ** 20, copy=True):
+        self.store_path, meta = build_well_stores(pickle_path, store_path)
+        self._wells = OrderedDict((w["name"], w) for w in meta["wells"])
+        self._stores = {}
+        self.cache = BoundedCache(max_bytes)
+        self.copy = copy
+
+    def names(self):
+        return list(self._wells.keys())
+
+    def info(self, name):
+        return self._wells[name]
+
+    def stats(self, name):
+        """Channel stats of a well from the catalog, see well_index.frame_stats."""
+        return self._wells[name]["stats"]
+
+    def summary(self, name):
+        span = self.stats(name)["channels"].get("ASHK2", {})
+        if not span.get("count"):
+            return "%s (%d rows)" % (name, self._wells[name]["rows"])
+        return "%s (%d rows, MD %.0f-%.0f)" % (name, self._wells[name]["rows"], span["first_depth"], span["last_depth"])
+
+    def store(self, name):
+        if name not in self._stores:
+            self._stores[name] = ChannelStore(os.path.join(self.store_path, self._wells[name]["dir"]))
+        return self._stores[name]
+
+    def channel(self, name, column):
+        values = self.cache.get((name, column))
+        if values is None:
+            with metrics.timer("well_load"):
+                values = self.store(name).channel(column)
+                if self.copy and not isinstance(values, pd.Categorical):
+                    values = np.array(values)  # copy out of the memory map into the cache
+            metrics.count("well_cache_misses", well=name)
+            self.cache.put((name, column), values)
+        return values
+
+    def index(self, name):
+        index = self.cache.get((name, None))
+        if index is None:
+            index = self.store(name).index()
+            self.cache.put((name, None), index.values)
+            return index
+        return pd.Index(index, name=self.store(name).schema["index"]["name"])
+
+    def frame(self, name, columns, start=None, stop=None):
+        """Rows [start, stop) of the given channels of one well."""
+        data = {col: self.channel(name, col)[start:stop] for col in columns}
+        return pd.DataFrame(data, index=self.index(name)[start:stop], columns=columns)
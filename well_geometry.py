@@ -0,0 +1,86 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def ribbon_topology(n):
+    """Mesh3d i/j/k triangles of a ribbon between two rows of n vertices.
+
+    Vertices 0..n-1 are the path, n..2n-1 the offset edge. The arrays only
+    depend on n, so wells of equal length share one read-only copy.
+    """
+    i = np.r_[np.arange(n - 1), np.arange(n - 1)]
+    j = np.r_[np.arange(n, 2 * n - 1), np.arange(n + 1, 2 * n)]
+    k = np.r_[np.arange(n + 1, 2 * n), np.arange(1, n)]
+    for a in (i, j, k):
+        a.setflags(write=False)
+    return i, j, k
+
+
+def trace_bytes(traces):
+    """Approximate payload of a list of plotly traces, for cache budgets."""
+    total = 0
+    for trace in traces:
+        for name in ("x", "y", "z", "i", "j", "k"):
+            value = getattr(trace, name, None)
+            if value is not None:
+                total += np.asarray(value).nbytes
+        line = getattr(trace, "line", None)
+        if line is not None and line.color is not None and not isinstance(line.color, str):
+            total += np.asarray(line.color).nbytes
+    return total
+
+
+def peak_indices(x, values, spacing):
+    """Index of the largest of `values` in every `spacing`-wide interval of the sorted `x`.
+
+    The peaks a ribbon of `values` drawn along x shows at that resolution;
+    intervals holding only NaNs contribute nothing.
+    """
+    x = np.asarray(x, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(x) == 0 or spacing <= 0:
+        return np.arange(len(x))
+    bucket = np.floor((x - x[0]) / spacing).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    v = np.where(np.isnan(values), -np.inf, values)
+    peak = np.repeat(np.maximum.reduceat(v, starts), np.diff(np.r_[starts, len(v)]))
+    idx = np.flatnonzero((v == peak) & np.isfinite(v))
+    # the first of equal peaks per interval
+    return idx[np.r_[True, bucket[idx[1:]] != bucket[idx[:-1]]]] if len(idx) else idx
+
+
+def simplify_path(points, tolerance, keep=None):
+    """Indices of the vertices kept by Douglas-Peucker simplification.
+
+    `points` is (n, d); a vertex is dropped when it lies within `tolerance`
+    of the segment joining its kept neighbours. Indices in `keep` are always
+    retained, and the path is simplified independently between them.
+    """
+    points = np.asarray(points, dtype=float)
+    n = len(points)
+    if n <= 2 or tolerance <= 0:
+        return np.arange(n)
+    mask = np.zeros(n, dtype=bool)
+    mask[[0, n - 1]] = True
+    if keep is not None:
+        mask[np.asarray(keep, dtype=int)] = True
+    anchors = np.flatnonzero(mask)
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    tol2 = tolerance * tolerance
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = points[b] - points[a]
+        rel = points[a + 1:b] - points[a]
+        seg2 = seg @ seg
+        t = np.clip(rel @ seg / seg2, 0, 1) if seg2 > 0 else np.zeros(len(rel))
+        d2 = ((rel - t[:, None] * seg) ** 2).sum(axis=1)
+        m = int(np.argmax(d2))
+        if d2[m] > tol2:
+            mask[a + 1 + m] = True
+            stack.append((a, a + 1 + m))
+            stack.append((a + 1 + m, b))
+    return np.flatnonzero(mask)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+## channels whose valid range defines the data section of a well
+SPAN_CHANNELS = ["ASHK2", "LSHK2"]
+
+
+def channel_stats(values, index=None):
+    """Valid range and summary statistics of one numeric channel.
+
+    first/last are row positions of the first and last non-NaN sample,
+    first_depth/last_depth the matching index values.
+    """
+    values = np.asarray(values, dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    stats = {"rows": len(values), "count": int(len(valid))}
+    if len(valid) == 0:
+        return stats
+    v = values[valid]
+    p01, p50, p99 = np.percentile(v, [1, 50, 99])
+    stats.update(first=int(valid[0]), last=int(valid[-1]), min=float(v.min()), max=float(v.max()),
+                 p01=float(p01), p50=float(p50), p99=float(p99))
+    if index is not None:
+        stats.update(first_depth=float(index[valid[0]]), last_depth=float(index[valid[-1]]))
+    return stats
+
+
+def frame_stats(df, span_channels=SPAN_CHANNELS):
+    """Per-channel stats of a frame, plus stats of every channel within each span channel's valid range.
+
+    spans[c][ch] covers rows [first, last) of channel c, the section trace3d and
+    trace2d draw.
+    """
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    index = np.asarray(df.index.values) if pd.api.types.is_numeric_dtype(df.index) else None
+    channels = {str(c): channel_stats(df[c].values, index) for c in numeric}
+    spans = {}
+    for span in span_channels:
+        if channels.get(span, {}).get("count"):
+            first, last = channels[span]["first"], channels[span]["last"]
+            spans[span] = {str(c): channel_stats(df[c].values[first:last]) for c in numeric}
+    return {"rows": len(df), "channels": channels, "spans": spans}
+
+
+class StreamingStats(object):
+    """channel_stats of a channel that is read in chunks.
+
+    rows, count, first/last, min/max and the depths are exact. Percentiles
+    come from a uniform reservoir of at most `reservoir` valid samples, so
+    they are exact up to that many samples and an estimate beyond.
+    """
+
+    def __init__(self, reservoir=65536, seed=0):
+        self.rows = 0
+        self.count = 0
+        self.first = self.last = None
+        self.first_depth = self.last_depth = None
+        self.min = np.inf
+        self.max = -np.inf
+        self._sample = np.empty(reservoir)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values, index=None):
+        values = np.asarray(values, dtype=float)
+        valid = np.flatnonzero(~np.isnan(values))
+        if len(valid):
+            if self.first is None:
+                self.first = self.rows + int(valid[0])
+                if index is not None:
+                    self.first_depth = float(index[valid[0]])
+            self.last = self.rows + int(valid[-1])
+            if index is not None:
+                self.last_depth = float(index[valid[-1]])
+            v = values[valid]
+            self.min = min(self.min, float(v.min()))
+            self.max = max(self.max, float(v.max()))
+            # algorithm R over the whole batch: sample k replaces a random slot with probability R / (k + 1)
+            size = len(self._sample)
+            k = self.count + np.arange(len(v))
+            fill = k < size
+            self._sample[k[fill]] = v[fill]
+            slot = (self._rng.random(int((~fill).sum())) * (k[~fill] + 1)).astype(np.int64)
+            take = slot < size
+            self._sample[slot[take]] = v[~fill][take]
+            self.count += len(v)
+        self.rows += len(values)
+
+    def result(self):
+        stats = {"rows": self.rows, "count": self.count}
+        if self.count == 0:
+            return stats
+        sample = self._sample[:min(self.count, len(self._sample))]
+        p01, p50, p99 = np.percentile(sample, [1, 50, 99])
+        stats.update(first=self.first, last=self.last, min=self.min, max=self.max,
+                     p01=float(p01), p50=float(p50), p99=float(p99))
+        if self.first_depth is not None:
+            stats.update(first_depth=self.first_depth, last_depth=self.last_depth)
+        return stats